@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+from api.tasks import (
+    ENRICHMENT_DEADLINE,
+    dispatch_notifications,
+    fetch_stream_thumbnail,
+    get_stream_info_hedged,
+    wait_stream_info,
+)
+from common.stats import LatencyHistogram
+from telegram.bot import bot
+from telegram.outbound import OutboundManager, outbounds
+from telegram.stub import StubBot
+from twitch import functions as twitch
+
+DRY_RUN_MAX_CHATS = 100000
+# first chat of synthetic user is private one, others are channels
+DRY_RUN_USER_CHATS = 3
+DRY_RUN_USER_ID = 7000000000
+DRY_RUN_CHANNEL_ID = -1007000000000
+
+
+def get_synthetic_chats(chats_count: int, bots_ids: list[int]) -> list[dict]:
+    chats = []
+    for index in range(chats_count):
+        user_id = DRY_RUN_USER_ID + index // DRY_RUN_USER_CHATS
+        chat_id = user_id
+        bot_id = bot.id
+        if index % DRY_RUN_USER_CHATS:
+            chat_id = DRY_RUN_CHANNEL_ID - index
+            bot_id = bots_ids[index % len(bots_ids)]
+        # every 4th chat has no picture, like chats with text-only notifications
+        picture_mode = "Stream start screenshot"
+        if index % 4 == 3:
+            picture_mode = "Disabled"
+        chats.append(
+            {
+                "id": chat_id,
+                "user_id": user_id,
+                "bot_id": bot_id,
+                "digest_window": 0,
+                "template": None,
+                "picture_mode": picture_mode,
+                "picture_id": None,
+                "restreams_links": (),
+                "render_key": (None, (), picture_mode, None),
+            }
+        )
+    return chats
+
+
+async def run_dry_run(streamer_login: str, chats_count: int) -> dict[str, float]:
+    # real enrichment, render and dispatch, only Telegram is stubbed
+    streamer_info = await twitch.get_streamer_info(streamer_login)
+    if not streamer_info:
+        return {}
+
+    started = time.monotonic()
+    enrichment_task = asyncio.create_task(get_stream_info_hedged(streamer_info["id"]))
+    thumbnail_task = fetch_stream_thumbnail(streamer_login)
+    stream_info, stream_details = await wait_stream_info(
+        enrichment_task, started + ENRICHMENT_DEADLINE, streamer_login
+    )
+    enriched = time.monotonic()
+
+    stub_bots = {bot_id: StubBot(bot_id) for bot_id in outbounds}
+    managers = {
+        bot_id: OutboundManager(stub_bot) for bot_id, stub_bot in stub_bots.items()
+    }
+    chats = get_synthetic_chats(min(chats_count, DRY_RUN_MAX_CHATS), list(managers))
+    await dispatch_notifications(
+        chats,
+        stream_info,
+        stream_details,
+        streamer_info["name"],
+        streamer_login,
+        f"dry run {streamer_login}",
+        thumbnail_task,
+        managers,
+        dry_run=True,
+    )
+    finished = time.monotonic()
+
+    # delivery times since notification start
+    histogram = LatencyHistogram(len(chats))
+    for stub_bot in stub_bots.values():
+        for delivered in stub_bot.delivered:
+            histogram.add(delivered - started)
+    duration = finished - started
+    return {
+        "chats": len(chats),
+        "delivered": len(histogram.samples),
+        "throttled": sum(stub_bot.throttled for stub_bot in stub_bots.values()),
+        "enrichment": enriched - started,
+        "duration": duration,
+        "throughput": len(histogram.samples) / duration if duration else 0.0,
+        "p50": histogram.percentile(50),
+        "p95": histogram.percentile(95),
+        "p99": histogram.percentile(99),
+        "max": histogram.percentile(100),
+    }
+
+
+def get_dry_run_report(streamer_login: str, report: dict[str, float]) -> str:
+    if not report:
+        return f"Streamer {streamer_login} not found"
+    return (
+        f"Dry run of {streamer_login}"
+        f"\n● chats\n○ {report['delivered']} of {report['chats']} delivered"
+        f"\n● 429 responses\n○ {report['throttled']}"
+        f"\n● enrichment\n○ {report['enrichment']:.2f}s"
+        f"\n● duration\n○ {report['duration']:.2f}s"
+        f"\n● throughput\n○ {report['throughput']:.1f} messages/s"
+        f"\n● latency (p50 / p95 / p99 / max)\n○ "
+        f"{report['p50']:.2f}s / {report['p95']:.2f}s / "
+        f"{report['p99']:.2f}s / {report['max']:.2f}s"
+    )
@@ -0,0 +1,63 @@
+import asyncio
+import time
+import traceback
+
+from common.config import cfg
+from crud import outbox as crud_outbox
+
+OUTBOX_FLUSH_INTERVAL = 1.0
+OUTBOX_MAX_ATTEMPTS = 3
+OUTBOX_KEEP_DAYS = 7
+OUTBOX_CLEANUP_INTERVAL = 3600.0
+# pending rows are resumed after restart only if event is that recent
+OUTBOX_RESUME_MINUTES = 10
+
+
+class OutboxWriter:
+    def __init__(self) -> None:
+        self._statuses: dict[tuple[str, str], list[int]] = {}
+        self._task: asyncio.Task | None = None
+        self._cleaned: float | None = None
+
+    def mark(self, message_id: str, chat_id: int, status: str) -> None:
+        self._statuses.setdefault((message_id, status), []).append(chat_id)
+
+    async def flush(self) -> None:
+        statuses, self._statuses = self._statuses, {}
+        for (message_id, status), chat_ids in statuses.items():
+            try:
+                await crud_outbox.update_status(message_id, chat_ids, status)
+            except Exception as exc:
+                # keep statuses for the next flush
+                self._statuses.setdefault((message_id, status), []).extend(chat_ids)
+                cfg.logger.error(f"Outbox flush error: {exc}")
+                traceback.print_exception(exc)
+
+    async def cleanup(self) -> None:
+        self._cleaned = time.monotonic()
+        try:
+            await crud_outbox.remove_old_rows(OUTBOX_KEEP_DAYS)
+        except Exception as exc:
+            cfg.logger.error(f"Outbox cleanup error: {exc}")
+            traceback.print_exception(exc)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(OUTBOX_FLUSH_INTERVAL)
+            await self.flush()
+            if (
+                self._cleaned == None
+                or time.monotonic() - self._cleaned >= OUTBOX_CLEANUP_INTERVAL
+            ):
+                await self.cleanup()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+
+
+outbox_writer = OutboxWriter()
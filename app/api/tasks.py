@@ -1,52 +1,235 @@
 import asyncio
+import time
 import traceback
 from contextlib import suppress
 from datetime import datetime, timezone
-from string import Template
 
-from aiogram import types
-from aiogram.exceptions import TelegramBadRequest
+from aiogram import methods, types
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramMigrateToChat,
+)
 from aiogram.utils.formatting import Bold, Text
+from api.outbox import OUTBOX_MAX_ATTEMPTS, OUTBOX_RESUME_MINUTES, outbox_writer
 from common.config import cfg
+from common.stats import (
+    STAGE_DEDUPE,
+    STAGE_ENRICHMENT,
+    STAGE_FIRST_SEND,
+    STAGE_LAST_SEND,
+    notification_stats,
+)
+from common.utils import create_background_task
+from crud import chats as crud_chats
+from crud import outbox as crud_outbox
 from crud import streamers as crud_streamers
 from crud import subscriptions as crud_subs
-from telegram.bot import bot
+from telegram.bot import bot, bots
+from telegram.digest import digests
+from telegram.outbound import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_LIVE,
+    SEND_FAILURE_BAD_REQUEST,
+    SEND_FAILURE_DEAD,
+    OutboundManager,
+    classify_send_failure,
+    find_chat_bot,
+    outbound,
+    outbounds,
+)
+from telegram.reports import error_reporter
+from telegram.utils.render import render_notification
 from twitch import functions as twitch
+from twitch.thumbnails import thumbnails
 
+# fresh thumbnail is checked after these delays in text first mode
+THUMBNAIL_WAIT_DELAYS = (5.0, 10.0, 15.0, 30.0, 60.0)
 
-async def send_notifications(event: dict, message_id: str) -> None:
-    streamer_id = event.get("broadcaster_user_id", "0")
-    streamer_login = event.get("broadcaster_user_login", "")
-    streamer_name = event.get("broadcaster_user_name", "")
+# stream info is waited this long since notification start,
+# /channels request is added if /streams doesn't answer in hedge delay
+ENRICHMENT_DEADLINE = 3.0
+ENRICHMENT_HEDGE_DELAY = 0.5
 
-    cfg.logger.info(f"Notification ({message_id}): {streamer_login} ({streamer_id})")
+# chats with membership checks in progress, simultaneous events don't repeat them
+pinning_chats: set[int] = set()
 
-    streamer_name_db = await crud_streamers.check_streamer(streamer_id)
-    if streamer_name_db == None:
-        cfg.logger.error("Streamer not in db")
-        return
-    elif streamer_name != "" and streamer_name_db != streamer_name:
-        await crud_streamers.update_streamer_name(streamer_id, streamer_name)
-        streamer_name_db = streamer_name
 
-    streamer_login = event.get("broadcaster_user_login", streamer_name_db.lower())
-    streamer_name = event.get("broadcaster_user_name", streamer_name_db)
+def get_stream_picture(
+    stream_info: dict[str, str],
+    streamer_login: str,
+    stream_thumbnail_file: bytes | None = None,
+) -> str | types.InputFile:
+    utc_now = datetime.now(tz=timezone.utc).strftime("%Y_%m_%d_%H_%M_%S_%f")
+    if stream_thumbnail_file:
+        return types.BufferedInputFile(
+            stream_thumbnail_file, filename=f"{streamer_login}_{utc_now}.jpg"
+        )
 
-    if await crud_streamers.check_duplicate_event_message(streamer_id, message_id):
-        cfg.logger.error("Duplicated event message")
+    stream_thumbnail = stream_info["thumbnail_url"].format(
+        width=str(cfg.TWITCH_THUMBNAIL_WIDTH),
+        height=str(cfg.TWITCH_THUMBNAIL_HEIGHT),
+    )
+    if cfg.TWITCH_THUMBNAIL_TELEGRAM_MODE == "file":
+        return types.URLInputFile(
+            stream_thumbnail, filename=f"{streamer_login}_{utc_now}.jpg"
+        )
+    return stream_thumbnail + f"?timestamp={utc_now}"
+
+
+async def upload_stream_picture(
+    manager: OutboundManager,
+    stream_info: dict[str, str],
+    streamer_login: str,
+    stream_thumbnail_file: bytes | None,
+) -> str | None:
+    return await manager.upload_photo(
+        get_stream_picture(stream_info, streamer_login, stream_thumbnail_file)
+    )
+
+
+def is_text_first(chat: dict) -> bool:
+    # digest messages are combined, so they aren't edited later
+    return (
+        cfg.TWITCH_THUMBNAIL_TEXT_FIRST
+        and chat["picture_mode"] == "Stream start screenshot"
+        and not chat["digest_window"]
+    )
+
+
+def get_stream_start(event: dict) -> datetime | None:
+    try:
+        return datetime.fromisoformat(event["started_at"])
+    except Exception:
+        return None
+
+
+async def attach_stream_picture(
+    stream_info: dict[str, str],
+    streamer_login: str,
+    stream_start: datetime | None,
+    sent_messages: list[tuple[OutboundManager, types.Message, int]],
+) -> None:
+    # thumbnail appears some time after stream start
+    stream_thumbnail_file = None
+    for delay in THUMBNAIL_WAIT_DELAYS:
+        await asyncio.sleep(delay)
+        stream_thumbnail_file = await thumbnails.fetch(
+            streamer_login,
+            stream_info["thumbnail_url"],
+            cfg.TWITCH_THUMBNAIL_WIDTH,
+            cfg.TWITCH_THUMBNAIL_HEIGHT,
+            newer_than=stream_start,
+        )
+        if stream_thumbnail_file:
+            break
+    else:
+        cfg.logger.warning(f"No fresh thumbnail of {streamer_login}")
         return
 
-    stream_info = await twitch.get_stream_info(streamer_id)
-    if not stream_info:
-        cfg.logger.warning("No stream info from Twitch API")
-        stream_info = await twitch.get_channel_info(streamer_id)
-        if not stream_info:
-            cfg.logger.warning("No channel info from Twitch API")
-        stream_info["thumbnail_url"] = (
-            "https://static-cdn.jtvnw.net/previews-ttv/live_user_"
-            + streamer_login
-            + "-{width}x{height}.jpg"
+    managers = {manager.bot.id: manager for manager, _, _ in sent_messages}
+    uploaded_pictures_ids = await asyncio.gather(
+        *[
+            upload_stream_picture(
+                manager, stream_info, streamer_login, stream_thumbnail_file
+            )
+            for manager in managers.values()
+        ]
+    )
+    stream_pictures_ids = dict(zip(managers, uploaded_pictures_ids))
+
+    async def edit_message(
+        manager: OutboundManager, message: types.Message, user_id: int
+    ) -> None:
+        stream_picture_id = stream_pictures_ids[manager.bot.id]
+        if not stream_picture_id:
+            return
+        try:
+            await manager.send(
+                methods.EditMessageMedia(
+                    chat_id=message.chat.id,
+                    message_id=message.message_id,
+                    media=types.InputMediaPhoto(
+                        media=stream_picture_id,
+                        caption=message.text,
+                        caption_entities=message.entities,
+                    ),
+                ),
+                priority=PRIORITY_INTERACTIVE,
+                fair_key=user_id,
+            )
+        except Exception as exc:
+            cfg.logger.warning(f"Chat {message.chat.id} picture edit error: {exc}")
+
+    await asyncio.gather(
+        *[
+            edit_message(manager, message, user_id)
+            for manager, message, user_id in sent_messages
+        ]
+    )
+    cfg.logger.info(f"Picture of {streamer_login} was added to notifications")
+
+
+async def get_stream_info_hedged(streamer_id: str) -> dict[str, str]:
+    # /channels is requested too if /streams is slow or empty,
+    # first non-empty answer is used
+    streams_task = asyncio.create_task(twitch.get_stream_info(streamer_id))
+    channels_task = None
+    try:
+        done, pending = await asyncio.wait(
+            {streams_task}, timeout=ENRICHMENT_HEDGE_DELAY
+        )
+        if streams_task in done and get_task_result(streams_task):
+            return streams_task.result()
+
+        channels_task = asyncio.create_task(twitch.get_channel_info(streamer_id))
+        pending.add(channels_task)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in (streams_task, channels_task):
+                if task in done and get_task_result(task):
+                    return task.result()
+        cfg.logger.warning("No stream and channel info from Twitch API")
+        return {}
+    finally:
+        for task in (streams_task, channels_task):
+            if task:
+                task.cancel()
+
+
+def get_task_result(task: asyncio.Task) -> dict[str, str]:
+    if task.exception():
+        cfg.logger.warning(f"Stream info error: {task.exception()}")
+        return {}
+    return task.result()
+
+
+def get_thumbnail_url(streamer_login: str) -> str:
+    return (
+        "https://static-cdn.jtvnw.net/previews-ttv/live_user_"
+        + streamer_login
+        + "-{width}x{height}.jpg"
+    )
+
+
+async def wait_stream_info(
+    enrichment_task: asyncio.Task[dict[str, str]],
+    enrichment_deadline: float,
+    streamer_login: str,
+) -> tuple[dict[str, str], str]:
+    # late stream info isn't waited, notification has event fields only then
+    try:
+        stream_info = await asyncio.wait_for(
+            enrichment_task, max(enrichment_deadline - time.monotonic(), 0)
         )
+    except asyncio.TimeoutError:
+        cfg.logger.warning("Stream info deadline was missed")
+        stream_info = {}
+    if "thumbnail_url" not in stream_info:
+        stream_info["thumbnail_url"] = get_thumbnail_url(streamer_login)
 
     stream_title = stream_info.get("title", "")
     stream_category = stream_info.get("category", "")
@@ -58,99 +241,346 @@ async def send_notifications(event: dict, message_id: str) -> None:
         stream_details += f"\n○ {stream_category}"
     if stream_details:
         stream_details += "\n"
+    return stream_info, stream_details
 
-    stream_picture_id = None
 
-    chats = await crud_subs.get_subscribed_chats(streamer_id)
-    cfg.logger.info(f"Chats: {[chat['id'] for chat in chats]}")
+def fetch_stream_thumbnail(streamer_login: str) -> asyncio.Task[bytes | None]:
+    # thumbnail url is known from login, so download doesn't wait stream info
+    return asyncio.create_task(
+        thumbnails.fetch(
+            streamer_login,
+            get_thumbnail_url(streamer_login),
+            cfg.TWITCH_THUMBNAIL_WIDTH,
+            cfg.TWITCH_THUMBNAIL_HEIGHT,
+        )
+    )
+
 
-    error_chats = {}
+class DispatchResult:
+    def __init__(self) -> None:
+        self.dead_chats: list[int] = []
+        self.migrated_chats: dict[int, int] = {}
+        self.lost_bot_chats: list[int] = []
+        self.text_first_messages: list[tuple[OutboundManager, types.Message, int]] = []
+
+
+async def dispatch_notifications(
+    chats: list[dict],
+    stream_info: dict[str, str],
+    stream_details: str,
+    streamer_name: str,
+    streamer_login: str,
+    message_id: str,
+    thumbnail_task: asyncio.Task[bytes | None],
+    managers: dict[int, OutboundManager] = outbounds,
+    dry_run: bool = False,
+) -> DispatchResult:
+    # dry run sends with stub managers and doesn't touch outbox and reports
+    primary_manager = managers[bot.id]
+    result = DispatchResult()
+
+    # screenshot is uploaded once per bot when first chat needs it,
+    # chats without screenshot don't wait for thumbnail and upload
+    pictures_uploads: dict[int, asyncio.Task[str | None]] = {}
+
+    async def upload_screenshot(manager: OutboundManager) -> str | None:
+        stream_thumbnail_file = await asyncio.shield(thumbnail_task)
+        return await upload_stream_picture(
+            manager, stream_info, streamer_login, stream_thumbnail_file
+        )
+
+    async def get_screenshot(manager: OutboundManager) -> str | types.InputFile:
+        upload_task = pictures_uploads.get(manager.bot.id)
+        if upload_task == None:
+            upload_task = asyncio.create_task(upload_screenshot(manager))
+            pictures_uploads[manager.bot.id] = upload_task
+        stream_picture_id = await asyncio.shield(upload_task)
+        if stream_picture_id:
+            return stream_picture_id
+        return get_stream_picture(
+            stream_info, streamer_login, await asyncio.shield(thumbnail_task)
+        )
+
+    # most chats share template, links and picture, so render each variant once
+    chats_groups: dict[tuple, list[dict]] = {}
     for chat in chats:
+        chats_groups.setdefault(chat["render_key"], []).append(chat)
+
+    # n-th chat of every user goes before (n+1)-th chat of any user,
+    # so users with many chats don't delay others
+    users_chats_count: dict[int, int] = {}
+    chats_ranks: dict[int, int] = {}
+    for chat in chats:
+        chats_ranks[chat["id"]] = users_chats_count.get(chat["user_id"], 0)
+        users_chats_count[chat["user_id"]] = chats_ranks[chat["id"]] + 1
+
+    async def get_notification_method(
+        manager: OutboundManager,
+        chat: dict,
+        message_text: str,
+        message_entities: list[types.MessageEntity],
+    ) -> methods.SendMessage | methods.SendPhoto | None:
+        chat_id = chat["id"]
+        picture_mode = chat["picture_mode"]
+        if is_text_first(chat):
+            picture_mode = "Disabled"
+        elif picture_mode == "Stream start screenshot":
+            photo = await get_screenshot(manager)
+        elif picture_mode == "Own pic":
+            photo = await manager.get_file_id(chat["picture_id"])
+        elif picture_mode != "Disabled":
+            return None
+
+        if picture_mode == "Disabled" or photo == None:
+            return methods.SendMessage(
+                chat_id=chat_id,
+                text=message_text,
+                entities=message_entities,
+                link_preview_options=types.LinkPreviewOptions(is_disabled=True),
+            )
+        return methods.SendPhoto(
+            chat_id=chat_id,
+            photo=photo,
+            caption=message_text,
+            caption_entities=message_entities,
+        )
+
+    async def send_to_chat(
+        manager: OutboundManager,
+        method: methods.SendMessage | methods.SendPhoto,
+        chat: dict,
+    ) -> types.Message | None:
         try:
-            template = Template(chat["template"] or "$streamer_name is live")
-            filled_template = template.safe_substitute({"streamer_name": streamer_name})
-            if chat["template"] == "":
-                filled_template = ""
-
-            links = [
-                f"twitch.tv/{streamer_login}",
-                *(chat["restreams_links"] or []),
-            ]
-
-            message = Text(
-                Bold(filled_template) if filled_template else "",
-                f"\n{stream_details}\n",
-                Bold("\n".join(links)),
+            # busy chats get notifications of one window in one message
+            if chat["digest_window"]:
+                await digests.send(
+                    manager, method, chat["digest_window"], fair_key=chat["user_id"]
+                )
+                return None
+            return await manager.send(
+                method,
+                request_timeout=180.0,
+                priority=PRIORITY_LIVE,
+                fair_key=chat["user_id"],
             )
-            message_text, message_entities = message.render()
-
-            if chat["picture_mode"] == "Disabled":
-                with suppress(TelegramBadRequest):
-                    await bot.send_message(
-                        chat_id=chat["id"],
-                        text=message_text,
-                        entities=message_entities,
-                        link_preview_options=types.LinkPreviewOptions(is_disabled=True),
-                        request_timeout=180.0,
-                    )
-            elif chat["picture_mode"] == "Stream start screenshot":
-                stream_picture = None
-                if stream_picture_id == None:
-                    utc_now = datetime.now(tz=timezone.utc).strftime(
-                        "%Y_%m_%d_%H_%M_%S_%f"
-                    )
-                    stream_thumbnail = stream_info["thumbnail_url"].format(
-                        width=str(cfg.TWITCH_THUMBNAIL_WIDTH),
-                        height=str(cfg.TWITCH_THUMBNAIL_HEIGHT),
-                    )
-                    stream_picture = stream_thumbnail + f"?timestamp={utc_now}"
-                    if cfg.TWITCH_THUMBNAIL_TELEGRAM_MODE == "file":
-                        stream_picture = types.URLInputFile(
-                            stream_thumbnail, filename=f"{streamer_login}_{utc_now}.jpg"
-                        )
-
-                with suppress(TelegramBadRequest):
-                    sended_message = await bot.send_photo(
-                        chat_id=chat["id"],
-                        photo=(stream_picture_id or stream_picture),
-                        caption=message_text,
-                        caption_entities=message_entities,
-                        request_timeout=180.0,
-                    )
-                if stream_picture_id == None:
-                    file_size = 0
-                    for photo in sended_message.photo:
-                        if photo.file_size > file_size:
-                            stream_picture_id = photo.file_id
-            elif chat["picture_mode"] == "Own pic":
-                with suppress(TelegramBadRequest):
-                    await bot.send_photo(
-                        chat_id=chat["id"],
-                        photo=chat["picture_id"],
-                        caption=message_text,
-                        caption_entities=message_entities,
-                        request_timeout=180.0,
-                    )
-            else:
-                pass
+        except TelegramMigrateToChat as exc:
+            result.migrated_chats[chat["id"]] = exc.migrate_to_chat_id
+            return await manager.send(
+                method.model_copy(update={"chat_id": exc.migrate_to_chat_id}),
+                request_timeout=180.0,
+                priority=PRIORITY_LIVE,
+                fair_key=chat["user_id"],
+            )
+
+    async def notify_chat(
+        chat: dict,
+        message_text: str,
+        message_entities: list[types.MessageEntity],
+    ) -> None:
+        chat_id = chat["id"]
+        manager = managers.get(chat["bot_id"], primary_manager)
+        try:
+            method = await get_notification_method(
+                manager, chat, message_text, message_entities
+            )
+            if method == None:
+                if not dry_run:
+                    outbox_writer.mark(message_id, chat_id, "failed")
+                return
+
+            try:
+                sent_message = await send_to_chat(manager, method, chat)
+            except TelegramAPIError as exc:
+                # shard bot could be removed from chat, primary bot tries then
+                failure = classify_send_failure(exc)
+                if manager == primary_manager or failure != SEND_FAILURE_DEAD:
+                    raise
+                cfg.logger.warning(f"Chat {chat_id} lost bot {manager.bot.id}: {exc}")
+                result.lost_bot_chats.append(chat_id)
+                manager = primary_manager
+                method = await get_notification_method(
+                    manager, chat, message_text, message_entities
+                )
+                sent_message = await send_to_chat(manager, method, chat)
 
-            cfg.logger.info(f"Chat {chat['id']} sended with {chat['picture_mode']}")
+            if is_text_first(chat) and sent_message:
+                result.text_first_messages.append(
+                    (manager, sent_message, chat["user_id"])
+                )
+            if not dry_run:
+                cfg.logger.info(f"Chat {chat_id} sended with {chat['picture_mode']}")
+                outbox_writer.mark(message_id, chat_id, "sent")
+            notification_stats.mark(message_id, STAGE_FIRST_SEND)
         except Exception as exc:
-            error_chats[chat["id"]] = str(exc)
-            cfg.logger.error(f"Chat {chat['id']} error: {exc}")
-            traceback.print_exception(exc)
-        await asyncio.sleep(1)
+            if dry_run:
+                cfg.logger.warning(f"Dry run chat {chat_id} error: {exc}")
+                return
+            outbox_writer.mark(message_id, chat_id, "failed")
+            failure = classify_send_failure(exc)
+            if failure == SEND_FAILURE_DEAD:
+                result.dead_chats.append(chat_id)
+                cfg.logger.warning(f"Chat {chat_id} is unavailable: {exc}")
+            elif failure == SEND_FAILURE_BAD_REQUEST:
+                cfg.logger.warning(f"Chat {chat_id} bad request: {exc}")
+            else:
+                error_reporter.report(
+                    "NOTIFICATION CHAT ERROR", exc, streamer_name, chat_id
+                )
+                cfg.logger.error(f"Chat {chat_id} error: {exc}")
+                traceback.print_exception(exc)
 
-    if cfg.ENV != "dev" and error_chats:
-        with suppress(TelegramBadRequest):
-            error_string = "\n".join(
-                [f"{chat}: {err}" for chat, err in error_chats.items()]
+    # every bot has own limits, so shards are sent in parallel
+    notifications = []
+    for render_key, group_chats in chats_groups.items():
+        template, restreams_links, _, _ = render_key
+        message_text, message_entities = render_notification(
+            template, restreams_links, streamer_name, streamer_login, stream_details
+        )
+        notifications.extend(
+            (
+                chats_ranks[chat["id"]],
+                notify_chat(chat, message_text, message_entities),
             )
-            await bot.send_message(
-                chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                text=f"ADMIN MESSAGE\nNOTIFICATION CHAT ERROR\nFROM {streamer_name}:\n{error_string}",
+            for chat in group_chats
+        )
+    notifications.sort(key=lambda notification: notification[0])
+    await asyncio.gather(*(notification for _, notification in notifications))
+    if not pictures_uploads:
+        thumbnail_task.cancel()
+    if notifications:
+        notification_stats.mark(message_id, STAGE_LAST_SEND)
+    return result
+
+
+async def send_notifications(
+    event: dict, message_id: str, resumed: bool = False
+) -> None:
+    streamer_id = event.get("broadcaster_user_id", "0")
+    streamer_login = event.get("broadcaster_user_login", "")
+    streamer_name = event.get("broadcaster_user_name", "")
+
+    cfg.logger.info(f"Notification ({message_id}): {streamer_login} ({streamer_id})")
+
+    enrichment_deadline = time.monotonic() + ENRICHMENT_DEADLINE
+    enrichment_task = asyncio.create_task(get_stream_info_hedged(streamer_id))
+    # thumbnail is downloaded while db steps and enrichment are running
+    thumbnail_task = None
+    if streamer_login:
+        thumbnail_task = fetch_stream_thumbnail(streamer_login)
+
+    # db steps don't depend on each other and on twitch api
+    db_steps = [
+        crud_streamers.check_streamer(streamer_id),
+        crud_outbox.get_pending_chats(message_id),
+        crud_subs.get_subscribed_chats(streamer_id),
+    ]
+    if not resumed:
+        db_steps.append(
+            crud_streamers.check_duplicate_event_message(streamer_id, message_id)
+        )
+    db_results = await asyncio.gather(*db_steps)
+    streamer_name_db, pending_chats, subscribed_chats, *duplicated = db_results
+    if streamer_name_db == None:
+        enrichment_task.cancel()
+        if thumbnail_task:
+            thumbnail_task.cancel()
+        cfg.logger.error("Streamer not in db")
+        for chat_id in pending_chats:
+            outbox_writer.mark(message_id, chat_id, "failed")
+        return
+    elif streamer_name != "" and streamer_name_db != streamer_name:
+        await crud_streamers.update_streamer_name(streamer_id, streamer_name)
+        streamer_name_db = streamer_name
+
+    streamer_login = event.get("broadcaster_user_login", streamer_name_db.lower())
+    streamer_name = event.get("broadcaster_user_name", streamer_name_db)
+
+    if any(duplicated):
+        enrichment_task.cancel()
+        if thumbnail_task:
+            thumbnail_task.cancel()
+        cfg.logger.error("Duplicated event message")
+        return
+    notification_stats.mark(message_id, STAGE_DEDUPE)
+
+    stream_info, stream_details = await wait_stream_info(
+        enrichment_task, enrichment_deadline, streamer_login
+    )
+    notification_stats.mark(message_id, STAGE_ENRICHMENT)
+
+    if thumbnail_task == None:
+        thumbnail_task = fetch_stream_thumbnail(streamer_login)
+
+    # only chats which were written to outbox with event and not sent yet,
+    # rows of chats unsubscribed since then are closed
+    chats = [chat for chat in subscribed_chats if chat["id"] in pending_chats]
+    for chat_id in pending_chats - {chat["id"] for chat in chats}:
+        outbox_writer.mark(message_id, chat_id, "failed")
+    cfg.logger.info(f"Chats: {[chat['id'] for chat in chats]}")
+
+    result = await dispatch_notifications(
+        chats,
+        stream_info,
+        stream_details,
+        streamer_name,
+        streamer_login,
+        message_id,
+        thumbnail_task,
+    )
+
+    # text is already delivered, picture is added when thumbnail is ready
+    if result.text_first_messages:
+        create_background_task(
+            attach_stream_picture(
+                stream_info,
+                streamer_login,
+                get_stream_start(event),
+                result.text_first_messages,
             )
-        await asyncio.sleep(1)
+        )
+
+    # such chats are skipped by next notifications without api calls
+    if result.dead_chats:
+        cfg.logger.info(f"Deactivating chats: {result.dead_chats}")
+        await crud_chats.deactivate_chats(result.dead_chats)
+    if result.lost_bot_chats:
+        await crud_chats.set_chats_bots(
+            {chat_id: None for chat_id in result.lost_bot_chats}
+        )
+    # unpinned chats were sent by primary bot, they are pinned for next time
+    skipped_chats = pinning_chats.union(result.dead_chats, result.migrated_chats)
+    unpinned_chats = [
+        chat["id"]
+        for chat in chats
+        if chat["bot_id"] not in outbounds and chat["id"] not in skipped_chats
+    ]
+    if unpinned_chats and len(bots) > 1:
+        pinning_chats.update(unpinned_chats)
+        create_background_task(pin_chats(unpinned_chats))
+    for chat_id, new_chat_id in result.migrated_chats.items():
+        cfg.logger.info(f"Migrating chat {chat_id} to {new_chat_id}")
+        await crud_chats.migrate_chat(chat_id, new_chat_id)
+
+
+async def pin_chats(chats_ids: list[int]) -> None:
+    # chat is pinned to bot once, next notifications skip membership checks,
+    # chat without definite membership answers is checked again next time
+    try:
+        chats_bots = await asyncio.gather(
+            *[find_chat_bot(chat_id) for chat_id in chats_ids]
+        )
+        chats_pins = {
+            chat_id: bot_id
+            for chat_id, bot_id in zip(chats_ids, chats_bots)
+            if bot_id != None
+        }
+        if chats_pins:
+            await crud_chats.set_chats_bots(chats_pins)
+    except Exception as exc:
+        cfg.logger.error(f"Chats pinning error: {exc}")
+        traceback.print_exception(exc)
+    finally:
+        pinning_chats.difference_update(chats_ids)
 
 
 async def revoke_subscriptions(event: dict, reason: str) -> None:
@@ -178,29 +608,21 @@ async def revoke_subscriptions(event: dict, reason: str) -> None:
     )
     message_text, message_entities = message.render()
 
-    error_users = {}
-    for user in users:
+    async def notify_user(user: int) -> None:
         try:
             with suppress(TelegramBadRequest):
-                await bot.send_message(
-                    chat_id=user, text=message_text, entities=message_entities
+                await outbound.send(
+                    methods.SendMessage(
+                        chat_id=user, text=message_text, entities=message_entities
+                    ),
+                    priority=PRIORITY_BULK,
                 )
         except Exception as exc:
-            error_users[user] = str(exc)
+            error_reporter.report("REVOKATION ERROR", exc, streamer_id, user)
             cfg.logger.error(f"User {user} error: {exc}")
             traceback.print_exception(exc)
-        await asyncio.sleep(1)
 
-    if cfg.ENV != "dev" and error_users:
-        with suppress(TelegramBadRequest):
-            error_string = "\n".join(
-                [f"{user}: {err}" for user, err in error_users.items()]
-            )
-            await bot.send_message(
-                chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                text=f"ADMIN MESSAGE\nREVOKATION ERROR\nFROM {streamer_id}:\n{error_string}",
-            )
-        await asyncio.sleep(1)
+    await asyncio.gather(*[notify_user(user) for user in users])
 
     if cfg.TELEGRAM_BOT_OWNER_ID not in users:
         message = Text(
@@ -212,37 +634,45 @@ async def revoke_subscriptions(event: dict, reason: str) -> None:
         )
         message_text, message_entities = message.render()
         with suppress(TelegramBadRequest):
-            await bot.send_message(
-                chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                text=message_text,
-                entities=message_entities,
+            await outbound.send(
+                methods.SendMessage(
+                    chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
+                    text=message_text,
+                    entities=message_entities,
+                )
             )
-        await asyncio.sleep(1)
 
 
 async def task_function(
-    event_type: str, event: dict, message_id: str, status: str
+    event_type: str, event: dict, message_id: str, status: str, resumed: bool = False
 ) -> None:
-    async with cfg.notification_semaphore:
-        try:
-            if event_type == "notification":
-                await send_notifications(event, message_id)
-            elif event_type == "revocation":
-                await revoke_subscriptions(event, status)
-            else:
-                return
-        except Exception as exc:
-            broadcaster = ""
-            if event_type == "notification":
-                broadcaster = event.get("broadcaster_user_name")
-            elif event_type == "revocation":
-                broadcaster = str(event.get("broadcaster_user_id"))
-
-            if cfg.ENV != "dev":
-                with suppress(TelegramBadRequest):
-                    await bot.send_message(
-                        chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                        text=f"ADMIN MESSAGE\n{event_type.upper()} ERROR\nFROM {broadcaster}\n{exc}",
-                    )
-            cfg.logger.error(f"Error {event_type} from {broadcaster}: {exc}")
-            traceback.print_exception(exc)
+    try:
+        if event_type == "notification":
+            await send_notifications(event, message_id, resumed)
+        elif event_type == "revocation":
+            await revoke_subscriptions(event, status)
+        else:
+            return
+    except Exception as exc:
+        broadcaster = ""
+        if event_type == "notification":
+            broadcaster = event.get("broadcaster_user_name")
+        elif event_type == "revocation":
+            broadcaster = str(event.get("broadcaster_user_id"))
+
+        error_reporter.report(f"{event_type.upper()} ERROR", exc, broadcaster)
+        cfg.logger.error(f"Error {event_type} from {broadcaster}: {exc}")
+        traceback.print_exception(exc)
+    finally:
+        notification_stats.finish(message_id)
+
+
+async def resume_notifications() -> None:
+    events = await crud_outbox.get_pending_events(
+        OUTBOX_MAX_ATTEMPTS, OUTBOX_RESUME_MINUTES
+    )
+    for message_id, event in events.items():
+        cfg.logger.info(f"Resuming notification ({message_id})")
+        create_background_task(
+            task_function("notification", event, message_id, "", resumed=True)
+        )
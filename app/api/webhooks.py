@@ -1,16 +1,17 @@
 import traceback
-from contextlib import suppress
 from typing import Any
 
 from aiogram import types
-from aiogram.exceptions import TelegramBadRequest
 from api.tasks import task_function
 from api.verification import verify_telegram_secret, verify_twitch_secret
 from common.config import cfg
+from common.stats import notification_stats
+from crud import outbox as crud_outbox
 from litestar import Request, Response, Router, post
 from litestar.background_tasks import BackgroundTask
 from litestar.status_codes import HTTP_200_OK, HTTP_204_NO_CONTENT
 from telegram.bot import bot, dp
+from telegram.reports import error_reporter
 
 
 @post("/webhooks/telegram")
@@ -22,12 +23,7 @@ async def webhook_telegram(data: dict[str, Any], headers: dict[str, str]) -> Any
         telegram_update = types.Update(**data)
         await dp.feed_update(bot=bot, update=telegram_update)
     except Exception as exc:
-        if cfg.ENV != "dev":
-            with suppress(TelegramBadRequest):
-                await bot.send_message(
-                    chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                    text=f"ADMIN MESSAGE\nTG ERROR\n{exc}",
-                )
+        error_reporter.report("TG ERROR", exc)
         cfg.logger.error(exc)
         cfg.logger.error(data)
         traceback.print_exception(exc)
@@ -75,6 +71,9 @@ async def webhook_twitch(
 
     elif event_type == "notification":
         if cfg.BOT_ACTIVE:
+            notification_stats.receive(message_id)
+            # persisted before answering, so twitch redelivers if it fails
+            await crud_outbox.add_event(message_id, streamer_id, data.get("event", {}))
             return Response(
                 status_code=HTTP_204_NO_CONTENT,
                 content=None,
@@ -3,6 +3,8 @@ from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager, suppress
 
 from aiogram.exceptions import TelegramBadRequest
+from api.outbox import outbox_writer
+from api.tasks import resume_notifications
 from api.webhooks import router as litestar_router
 from common.config import cfg
 from crud.streamers import get_all_streamers, update_streamer_name
@@ -10,23 +12,30 @@ from crud.users import add_user, get_users, update_user
 from db.common import _engine, check_db
 from litestar import Litestar, Request, Response
 from litestar.status_codes import HTTP_500_INTERNAL_SERVER_ERROR
-from telegram.bot import bot, dp
+from telegram.bot import bot, bots, dp
 from telegram.commands import COMMANDS
 from telegram.middlewares import (
     ActiveBotMiddleware,
     AdminMiddleware,
     AuthChatMiddleware,
+    OutboundRequestMiddleware,
 )
+from telegram.reports import error_reporter
 from telegram.routes.admin import router as telegram_router_admin
 from telegram.routes.base import router as telegram_router_base
 from telegram.routes.subscriptions import router as telegram_router_subscriptions
+from twitch.api import token_manager, twitch_client
 from twitch.functions import get_streamers_names
+from twitch.thumbnails import thumbnails
 from versions import APP_VERSION_STRING
 
 
 @asynccontextmanager
 async def lifespan_function(app: Litestar) -> AsyncGenerator[None, None]:
     await check_db()
+    error_reporter.start()
+    twitch_client.open()
+    token_manager.start()
 
     # webhook_info = await bot.get_webhook_info()
     # if webhook_info.url != f"https://{cfg.DOMAIN}/webhooks/telegram":
@@ -45,6 +54,8 @@ async def lifespan_function(app: Litestar) -> AsyncGenerator[None, None]:
     dp.callback_query.middleware(ActiveBotMiddleware())
     dp.callback_query.middleware(AuthChatMiddleware())
     dp.callback_query.middleware(AdminMiddleware())
+    for shard_bot in bots:
+        shard_bot.session.middleware(OutboundRequestMiddleware())
     await bot.set_my_commands(COMMANDS)
     await bot.set_my_description("Twitch stream.online notification bot")
 
@@ -98,6 +109,9 @@ async def lifespan_function(app: Litestar) -> AsyncGenerator[None, None]:
                 text=f"ADMIN MESSAGE\nBOT STARTED\n{APP_VERSION_STRING}",
             )
 
+    outbox_writer.start()
+    await resume_notifications()
+
     try:
         yield
     finally:
@@ -108,7 +122,13 @@ async def lifespan_function(app: Litestar) -> AsyncGenerator[None, None]:
                     text="ADMIN MESSAGE\nBOT WAS STOPPED",
                 )
 
-        await bot.session.close()
+        await outbox_writer.stop()
+        await error_reporter.stop()
+        await thumbnails.close()
+        token_manager.stop()
+        await twitch_client.close()
+        for shard_bot in bots:
+            await shard_bot.session.close()
         await _engine.dispose()
 
 
@@ -57,8 +57,6 @@ class ConfigManager:
             sys.exit(1)
         self.logger.info("Secrets were loaded")
         self.lock = asyncio.Lock()
-        # Telegram limit is 30 messages per second, so...
-        self.notification_semaphore = asyncio.Semaphore(20)
 
     def load_creds_sync(self) -> None:
         with open(self._config_file, "r") as f:
@@ -160,6 +158,10 @@ class ConfigManager:
             self.TWITCH_THUMBNAIL_TELEGRAM_MODE: str = twitch_thumbnail_data[
                 "telegram_mode"
             ]
+            # screenshot notifications are sent as text and get picture later
+            self.TWITCH_THUMBNAIL_TEXT_FIRST: bool = twitch_thumbnail_data.get(
+                "text_first", False
+            )
         except Exception:
             no_secrets.append(f"{self.ENV}/twitch/thumbnail")
 
@@ -168,8 +170,44 @@ class ConfigManager:
         try:
             self.TELEGRAM_BOT_OWNER_ID: int = telegram_data["owner_id"]
             self.TELEGRAM_TOKEN: str = telegram_data["token"]
+            # extra bots for notifications, each one has its own rate limits,
+            # they must be able to post to storage chat
+            self.TELEGRAM_SHARD_TOKENS: list[str] = telegram_data.get(
+                "shard_tokens", []
+            )
+            self.TELEGRAM_STORAGE_CHAT_ID: int = telegram_data.get(
+                "storage_chat_id", self.TELEGRAM_BOT_OWNER_ID
+            )
             self.TELEGRAM_SECRET: str = telegram_data["secret"]
             self.TELEGRAM_LIMIT_DEFAULT = int(telegram_data["limit_default"])
+            self.TELEGRAM_RATE_LIMIT = float(telegram_data.get("rate_limit", 30))
+            self.TELEGRAM_RATE_LIMIT_PRIVATE = float(
+                telegram_data.get("rate_limit_private", 1)
+            )
+            self.TELEGRAM_RATE_LIMIT_GROUP = float(
+                telegram_data.get("rate_limit_group", 20)
+            )
+            # storage chat is owner private chat by default,
+            # dedicated channel for uploads can take more
+            self.TELEGRAM_RATE_LIMIT_STORAGE = float(
+                telegram_data.get("rate_limit_storage", 1)
+            )
+            self.TELEGRAM_RETRY_ATTEMPTS = int(telegram_data.get("retry_attempts", 5))
+            # window starts at initial and is cut down to min by 429 responses
+            self.TELEGRAM_CONCURRENCY_INITIAL = int(
+                telegram_data.get("concurrency_initial", 20)
+            )
+            self.TELEGRAM_CONCURRENCY_MIN = int(telegram_data.get("concurrency_min", 2))
+            self.TELEGRAM_CONCURRENCY_MAX = int(
+                telegram_data.get("concurrency_max", 100)
+            )
+            self.TELEGRAM_CONCURRENCY_LATENCY = float(
+                telegram_data.get("concurrency_latency", 2.0)
+            )
+            # owner gets one errors report per window
+            self.TELEGRAM_ERROR_REPORT_WINDOW = float(
+                telegram_data.get("error_report_window", 60)
+            )
             self.TELEGRAM_INVITE_CODE = generate_code()
             self.TELEGRAM_USERS: dict[int, dict[str, int | str | None]] = {}
         except Exception:
@@ -0,0 +1,182 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Hashable
+
+# lower priority waiter is served out of order after waiting this long,
+# but not more often than once per interval, so higher priorities keep the rate
+STARVATION_TIMEOUT = 10.0
+STARVATION_INTERVAL = 1.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        # per priority heap of (finish tag, sequence, future, enqueue time)
+        self._waiters: dict[int, list[tuple[float, int, asyncio.Future, float]]] = {}
+        self._virtual_time: dict[int, float] = {}
+        self._finish_tags: dict[int, dict[Hashable, float]] = {}
+        self._sequence = itertools.count()
+        self._waiting = 0
+        self._dispatcher: asyncio.Task | None = None
+        self._starved_grant = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def set_rate(self, rate: float, capacity: float | None = None) -> None:
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def pause(self, delay: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def acquire(
+        self, priority: int = 0, key: Hashable = None, weight: float = 1.0
+    ) -> None:
+        self._refill()
+        if (
+            self._waiting == 0
+            and self._tokens >= 1
+            and self._paused_until <= time.monotonic()
+        ):
+            self._tokens -= 1
+            return
+
+        # lower value is served first, waiters of one priority are shared
+        # between keys by weighted fair queuing and are FIFO within one key,
+        # waiters without key share one flow
+        finish_tags = self._finish_tags.setdefault(priority, {})
+        finish_tag = (
+            max(self._virtual_time.get(priority, 0.0), finish_tags.get(key, 0.0))
+            + 1 / weight
+        )
+        finish_tags[key] = finish_tag
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters.setdefault(priority, []),
+            (finish_tag, next(self._sequence), future, time.monotonic()),
+        )
+        self._waiting += 1
+        if self._dispatcher == None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        # cancelled waiters are dropped without taking a token
+        for waiters in self._waiters.values():
+            while waiters and waiters[0][2].done():
+                heapq.heappop(waiters)
+                self._waiting -= 1
+        priorities = sorted(
+            priority for priority, waiters in self._waiters.items() if waiters
+        )
+        if not priorities:
+            return None
+
+        now = time.monotonic()
+        if now - self._starved_grant >= STARVATION_INTERVAL:
+            for priority in reversed(priorities[1:]):
+                _, _, _, enqueued = self._waiters[priority][0]
+                if now - enqueued >= STARVATION_TIMEOUT:
+                    self._starved_grant = now
+                    priorities = [priority]
+                    break
+
+        priority = priorities[0]
+        finish_tag, _, future, _ = heapq.heappop(self._waiters[priority])
+        self._waiting -= 1
+        self._virtual_time[priority] = finish_tag
+        if not self._waiters[priority]:
+            # all flows are served, their tags are not needed anymore
+            self._finish_tags[priority].clear()
+        return future
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            if (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+                continue
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            future = self._next_waiter()
+            if future == None:
+                break
+            self._tokens -= 1
+            future.set_result(None)
+
+
+class AdaptiveLimiter:
+    # AIMD: window grows by one per window of fast requests
+    # and is cut by decrease factor on throttling
+    DECREASE_FACTOR = 0.5
+    DECREASE_INTERVAL = 1.0
+
+    def __init__(
+        self, initial: int, minimum: int, maximum: int, latency_target: float
+    ) -> None:
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._decreased = 0.0
+
+    def set_bounds(self, minimum: int, maximum: int, latency_target: float) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.window = min(max(self.window, minimum), maximum)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.window):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self) -> None:
+        if not self._waiters and self.in_flight < int(self.window):
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # slot was given right before cancelling
+            if future.done() and not future.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def release(self, latency: float, throttled: bool) -> None:
+        self.in_flight -= 1
+        if throttled:
+            now = time.monotonic()
+            # one burst of 429 responses is one decrease
+            if now - self._decreased >= self.DECREASE_INTERVAL:
+                self._decreased = now
+                self.window = max(self.minimum, self.window * self.DECREASE_FACTOR)
+        elif latency <= self.latency_target and self.in_flight + 1 >= int(self.window):
+            self.window = min(self.maximum, self.window + 1 / self.window)
+        self._wake()
@@ -0,0 +1,72 @@
+import math
+import time
+from collections import deque
+
+# latest samples per stage, so stats show current deploy behaviour
+STATS_WINDOW_SIZE = 1000
+# events without finish (crashed tasks) are dropped after this time
+STATS_EVENT_TTL = 3600.0
+
+STAGE_DEDUPE = "dedupe"
+STAGE_ENRICHMENT = "enrichment"
+STAGE_FIRST_SEND = "first send"
+STAGE_LAST_SEND = "last send"
+STAGES = (STAGE_DEDUPE, STAGE_ENRICHMENT, STAGE_FIRST_SEND, STAGE_LAST_SEND)
+
+
+class LatencyHistogram:
+    def __init__(self, size: int = STATS_WINDOW_SIZE) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def percentile(self, percent: float) -> float:
+        # nearest-rank percentile
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        rank = math.ceil(percent / 100 * len(samples))
+        return samples[max(rank, 1) - 1]
+
+
+class NotificationStats:
+    def __init__(self) -> None:
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self._events: dict[str, tuple[float, set[str]]] = {}
+
+    def receive(self, message_id: str) -> None:
+        now = time.monotonic()
+        for event_id, (received, _) in list(self._events.items()):
+            if now - received > STATS_EVENT_TTL:
+                del self._events[event_id]
+        self._events[message_id] = (now, set())
+
+    def mark(self, message_id: str, stage: str) -> None:
+        # time since webhook receipt, every stage is counted once per event,
+        # events resumed from outbox after restart have no receipt time
+        event = self._events.get(message_id)
+        if event == None:
+            return
+        received, marked = event
+        if stage in marked:
+            return
+        marked.add(stage)
+        self.histograms[stage].add(time.monotonic() - received)
+
+    def finish(self, message_id: str) -> None:
+        self._events.pop(message_id, None)
+
+    def get_report(self) -> dict[str, dict[str, float]]:
+        return {
+            stage: {
+                "count": len(histogram.samples),
+                "p50": histogram.percentile(50),
+                "p95": histogram.percentile(95),
+                "p99": histogram.percentile(99),
+            }
+            for stage, histogram in self.histograms.items()
+        }
+
+
+notification_stats = NotificationStats()
@@ -1,9 +1,12 @@
+import asyncio
 import getopt
 import logging
 import secrets
 import string
 import sys
+from collections.abc import Coroutine
 from types import SimpleNamespace
+from typing import Any, TypeVar
 
 from litestar.logging import LoggingConfig
 
@@ -12,10 +15,21 @@ levelDEBUG = logging.DEBUG
 levelINFO = logging.INFO
 FORMAT = "%(levelname)-8s\t%(asctime)s\t\t%(message)s"
 
+T = TypeVar("T")
+
+# references to background tasks, so they aren't garbage collected
+background_tasks: set[asyncio.Task] = set()
+
 
 def get_args() -> SimpleNamespace:
-    args = SimpleNamespace(env="dev", host="0.0.0.0", port=8880)
-    opts, _ = getopt.getopt(sys.argv[1:], "H:P:E:", ["host=", "port=", "env="])
+    args = SimpleNamespace(
+        env="dev", host="0.0.0.0", port=8880, streamer="", chats=1000
+    )
+    opts, _ = getopt.getopt(
+        sys.argv[1:],
+        "H:P:E:S:N:",
+        ["host=", "port=", "env=", "streamer=", "chats="],
+    )
     for name, value in opts:
         if name in ("-H", "--host"):
             args.host = value
@@ -23,6 +37,10 @@ def get_args() -> SimpleNamespace:
             args.port = int(value)
         if name in ("-E", "--env"):
             args.env = value
+        if name in ("-S", "--streamer"):
+            args.streamer = value
+        if name in ("-N", "--chats"):
+            args.chats = int(value)
     return args
 
 
@@ -61,3 +79,10 @@ def generate_code() -> str:
         ):
             break
     return code
+
+
+def create_background_task(coro: Coroutine[Any, Any, T]) -> asyncio.Task[T]:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
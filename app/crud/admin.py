@@ -1,5 +1,6 @@
 from typing import Any
 
+from crud.subscriptions import invalidate_render_plans
 from db.common import async_session, get_model_dict
 from db.models import Chats, Streamers, Subscriptions, Users
 from sqlalchemy import delete, insert, select
@@ -32,3 +33,4 @@ async def restore_dump(dump: dict[str, list[dict[str, Any]]]) -> None:
             await session.execute(delete(tables[table]))
             if table_dump:
                 await session.execute(insert(tables[table]).values(table_dump))
+    invalidate_render_plans()
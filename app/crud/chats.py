@@ -1,6 +1,7 @@
+from crud.subscriptions import invalidate_render_plans, update_render_plans
 from db.common import async_session
 from db.models import Chats, Subscriptions
-from sqlalchemy import delete, insert, select
+from sqlalchemy import delete, insert, select, update
 
 
 async def chat_exists(chat_id: int) -> bool:
@@ -23,10 +24,102 @@ async def add_chat(chat_id: int, user_id: int) -> bool:
     async with async_session() as session, session.begin():
         db_chat = await session.scalar(select(Chats).where(Chats.id == chat_id))
         if db_chat:
-            return False
+            db_chat.active = True
+            db_chat.bot_id = None
+        else:
+            await session.execute(
+                insert(Chats).values({"id": chat_id, "user_id": user_id})
+            )
+    invalidate_render_plans()
+    return db_chat == None
 
-        await session.execute(insert(Chats).values({"id": chat_id, "user_id": user_id}))
-        return True
+
+async def activate_chat(chat_id: int) -> None:
+    # active chat keeps its bot and kept plans
+    async with async_session() as session, session.begin():
+        db_chat_id = await session.scalar(
+            update(Chats)
+            .where(Chats.id == chat_id, Chats.active == False)
+            .values(active=True, bot_id=None)
+            .returning(Chats.id)
+        )
+        if db_chat_id == None:
+            return
+        db_streamers_ids = await session.scalars(
+            select(Subscriptions.streamer_id).where(Subscriptions.chat_id == chat_id)
+        )
+        streamers_ids = list(db_streamers_ids)
+    # deactivated chat was dropped from plans, plans of its streamers are read again
+    for streamer_id in streamers_ids:
+        invalidate_render_plans(streamer_id)
+
+
+async def deactivate_chats(chat_ids: list[int]) -> None:
+    async with async_session() as session, session.begin():
+        await session.execute(
+            update(Chats).where(Chats.id.in_(chat_ids)).values(active=False)
+        )
+    update_render_plans({chat_id: None for chat_id in chat_ids})
+
+
+async def set_chats_bots(chats_bots: dict[int, int | None]) -> None:
+    async with async_session() as session, session.begin():
+        # one bulk UPDATE by primary key
+        await session.execute(
+            update(Chats),
+            [
+                {"id": chat_id, "bot_id": bot_id}
+                for chat_id, bot_id in chats_bots.items()
+            ],
+        )
+    update_render_plans(
+        {chat_id: {"bot_id": bot_id} for chat_id, bot_id in chats_bots.items()}
+    )
+
+
+async def get_digest_window(chat_id: int) -> int:
+    async with async_session() as session, session.begin():
+        db_chat = await session.scalar(select(Chats).where(Chats.id == chat_id))
+        if not db_chat:
+            return 0
+        return db_chat.digest_window
+
+
+async def change_digest_window(chat_id: int, digest_window: int) -> None:
+    async with async_session() as session, session.begin():
+        await session.execute(
+            update(Chats).where(Chats.id == chat_id).values(digest_window=digest_window)
+        )
+    invalidate_render_plans()
+
+
+async def migrate_chat(chat_id: int, new_chat_id: int) -> None:
+    async with async_session() as session, session.begin():
+        db_chat = await session.scalar(select(Chats).where(Chats.id == new_chat_id))
+        if db_chat:
+            await session.execute(
+                delete(Subscriptions).where(
+                    Subscriptions.chat_id == chat_id,
+                    Subscriptions.streamer_id.in_(
+                        select(Subscriptions.streamer_id).where(
+                            Subscriptions.chat_id == new_chat_id
+                        )
+                    ),
+                )
+            )
+            await session.execute(delete(Chats).where(Chats.id == chat_id))
+        else:
+            await session.execute(
+                update(Chats)
+                .where(Chats.id == chat_id)
+                .values(id=new_chat_id, active=True)
+            )
+        await session.execute(
+            update(Subscriptions)
+            .where(Subscriptions.chat_id == chat_id)
+            .values(chat_id=new_chat_id)
+        )
+    invalidate_render_plans()
 
 
 async def remove_chats(chat_ids: list[int]) -> None:
@@ -35,6 +128,7 @@ async def remove_chats(chat_ids: list[int]) -> None:
             delete(Subscriptions).where(Subscriptions.chat_id.in_(chat_ids))
         )
         await session.execute(delete(Chats).where(Chats.id.in_(chat_ids)))
+    invalidate_render_plans()
 
 
 async def get_user_chats(user_id: int) -> list[int]:
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from db.common import async_session
+from db.models import Chats, Outbox, Subscriptions
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.types import JSON
+
+
+async def add_event(message_id: str, streamer_id: str, event: dict[str, Any]) -> None:
+    # one INSERT ... SELECT for all subscribed chats, repeated events are skipped
+    async with async_session() as session, session.begin():
+        chats = select(
+            literal(message_id),
+            literal(streamer_id),
+            Subscriptions.chat_id,
+            literal(event, JSON),
+            literal("pending"),
+            literal(0),
+        ).where(
+            Subscriptions.chat_id.in_(select(Chats.id).where(Chats.active)),
+            Subscriptions.streamer_id == streamer_id,
+        )
+        await session.execute(
+            insert(Outbox)
+            .from_select(
+                [
+                    "message_id",
+                    "streamer_id",
+                    "chat_id",
+                    "event",
+                    "status",
+                    "attempts",
+                ],
+                chats,
+            )
+            .on_conflict_do_nothing(index_elements=["message_id", "chat_id"])
+        )
+
+
+async def get_pending_chats(message_id: str) -> set[int]:
+    async with async_session() as session, session.begin():
+        db_chats = await session.scalars(
+            select(Outbox.chat_id).where(
+                Outbox.message_id == message_id, Outbox.status == "pending"
+            )
+        )
+        return set(db_chats)
+
+
+async def get_pending_events(
+    max_attempts: int, max_age_minutes: int
+) -> dict[str, dict[str, Any]]:
+    # late notification of long gone stream isn't sent
+    created_after = datetime.now(timezone.utc) - timedelta(minutes=max_age_minutes)
+    async with async_session() as session, session.begin():
+        await session.execute(
+            update(Outbox)
+            .where(
+                Outbox.status == "pending",
+                (Outbox.attempts >= max_attempts) | (Outbox.created_at < created_after),
+            )
+            .values(status="failed")
+        )
+        db_events = await session.scalars(
+            update(Outbox)
+            .where(Outbox.status == "pending")
+            .values(attempts=Outbox.attempts + 1)
+            .returning(Outbox)
+        )
+        return {row.message_id: row.event for row in db_events}
+
+
+async def update_status(message_id: str, chat_ids: list[int], status: str) -> None:
+    async with async_session() as session, session.begin():
+        await session.execute(
+            update(Outbox)
+            .where(Outbox.message_id == message_id, Outbox.chat_id.in_(chat_ids))
+            .values(status=status, attempts=Outbox.attempts + 1)
+        )
+
+
+async def remove_old_rows(days: int) -> None:
+    async with async_session() as session, session.begin():
+        await session.execute(
+            delete(Outbox).where(
+                Outbox.created_at < datetime.now(timezone.utc) - timedelta(days=days)
+            )
+        )
@@ -2,6 +2,34 @@ from db.common import async_session
 from db.models import Chats, Streamers, Subscriptions
 from sqlalchemy import delete, distinct, func, insert, join, select, update
 
+# subscribed chats with render settings by streamer, so go-live doesn't read db,
+# dropped on every subscription or chat change and read again on next go-live
+_render_plans: dict[str, list[dict]] = {}
+_render_plans_version = 0
+
+
+def invalidate_render_plans(streamer_id: str | None = None) -> None:
+    global _render_plans_version
+    _render_plans_version += 1
+    if streamer_id == None:
+        _render_plans.clear()
+    else:
+        _render_plans.pop(streamer_id, None)
+
+
+def update_render_plans(chats_values: dict[int, dict | None]) -> None:
+    # chat fields are changed in kept plans of all streamers, None drops chat
+    global _render_plans_version
+    _render_plans_version += 1
+    for streamer_id, render_plans in _render_plans.items():
+        updated_plans = []
+        for render_plan in render_plans:
+            if render_plan["id"] not in chats_values:
+                updated_plans.append(render_plan)
+            elif chats_values[render_plan["id"]] != None:
+                updated_plans.append({**render_plan, **chats_values[render_plan["id"]]})
+        _render_plans[streamer_id] = updated_plans
+
 
 async def subscribe_to_streamer(chat_id: int, streamer_id: str) -> bool:
     async with async_session() as session, session.begin():
@@ -23,7 +51,8 @@ async def subscribe_to_streamer(chat_id: int, streamer_id: str) -> bool:
                 }
             )
         )
-        return True
+    invalidate_render_plans(streamer_id)
+    return True
 
 
 async def unsubscribe_from_streamer(chat_id: int, streamer_id: str) -> None:
@@ -34,23 +63,45 @@ async def unsubscribe_from_streamer(chat_id: int, streamer_id: str) -> None:
                 Subscriptions.streamer_id == streamer_id,
             )
         )
+    invalidate_render_plans(streamer_id)
 
 
 async def get_subscribed_chats(streamer_id: str) -> list[dict[str, int | str]]:
-    async with async_session() as session, session.begin():
-        db_subscriptions = await session.scalars(
-            select(Subscriptions).where(Subscriptions.streamer_id == streamer_id)
-        )
-        return [
-            {
-                "id": sub.chat_id,
-                "template": sub.message_template,
-                "picture_mode": sub.picture_mode,
-                "picture_id": sub.picture_id,
-                "restreams_links": sub.restreams_links,
-            }
-            for sub in db_subscriptions
-        ]
+    render_plans = _render_plans.get(streamer_id)
+    if render_plans == None:
+        version = _render_plans_version
+        async with async_session() as session, session.begin():
+            db_subscriptions = await session.execute(
+                select(Subscriptions, Chats.user_id, Chats.bot_id, Chats.digest_window)
+                .join(Chats, Chats.id == Subscriptions.chat_id)
+                .where(Subscriptions.streamer_id == streamer_id, Chats.active)
+            )
+            render_plans = []
+            for sub, user_id, bot_id, digest_window in db_subscriptions:
+                restreams_links = tuple(sub.restreams_links or [])
+                render_plans.append(
+                    {
+                        "id": sub.chat_id,
+                        "user_id": user_id,
+                        "bot_id": bot_id,
+                        "digest_window": digest_window,
+                        "template": sub.message_template,
+                        "picture_mode": sub.picture_mode,
+                        "picture_id": sub.picture_id,
+                        "restreams_links": restreams_links,
+                        # chats with the same key get the same message
+                        "render_key": (
+                            sub.message_template,
+                            restreams_links,
+                            sub.picture_mode,
+                            sub.picture_id,
+                        ),
+                    }
+                )
+        # plans read before concurrent change are not kept
+        if version == _render_plans_version:
+            _render_plans[streamer_id] = render_plans
+    return [dict(render_plan) for render_plan in render_plans]
 
 
 async def get_subscribed_streamers(chat_id: int) -> dict[str, str]:
@@ -107,6 +158,7 @@ async def change_template(chat_id: int, streamer_id: str, new_template: str) ->
             )
             .values(message_template=new_template)
         )
+    invalidate_render_plans(streamer_id)
 
 
 async def get_subscribed_users(streamer_id: str) -> set[int]:
@@ -124,6 +176,7 @@ async def remove_streamer_subscriptions(streamer_id: str) -> None:
         await session.execute(
             delete(Subscriptions).where(Subscriptions.streamer_id == streamer_id)
         )
+    invalidate_render_plans(streamer_id)
 
 
 async def get_current_picture_mode(chat_id: int, streamer_id: str) -> str:
@@ -149,6 +202,7 @@ async def change_picture_mode(
             )
             .values(picture_mode=picture_mode, picture_id=picture_id)
         )
+    invalidate_render_plans(streamer_id)
 
 
 async def get_current_restreams_links(chat_id: int, streamer_id: str) -> list[str]:
@@ -174,6 +228,7 @@ async def change_restreams_links(
             )
             .values(restreams_links=links)
         )
+    invalidate_render_plans(streamer_id)
 
 
 async def get_user_subscription_count(user_id: int) -> tuple[int]:
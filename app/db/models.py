@@ -1,6 +1,9 @@
-from sqlalchemy import MetaData
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import MetaData, UniqueConstraint, func, true
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column
-from sqlalchemy.types import BIGINT, JSON, Text
+from sqlalchemy.types import BIGINT, JSON, DateTime, Text
 
 SCHEMA = "tntb"
 Base = declarative_base(metadata=MetaData(schema=SCHEMA))
@@ -19,6 +22,9 @@ class Chats(Base):
 
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=False)
     user_id: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    active: Mapped[bool] = mapped_column(nullable=False, server_default=true())
+    bot_id: Mapped[int | None] = mapped_column(BIGINT, nullable=True)
+    digest_window: Mapped[int] = mapped_column(nullable=False, server_default="0")
 
 
 class Streamers(Base):
@@ -39,3 +45,19 @@ class Subscriptions(Base):
     picture_mode: Mapped[str] = mapped_column(nullable=False)
     picture_id: Mapped[str] = mapped_column(nullable=True)
     restreams_links: Mapped[list[str]] = mapped_column(JSON, nullable=True)
+
+
+class Outbox(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (UniqueConstraint("message_id", "chat_id"),)
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    message_id: Mapped[str] = mapped_column(nullable=False)
+    streamer_id: Mapped[str] = mapped_column(nullable=False)
+    chat_id: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    event: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, index=True)
+    attempts: Mapped[int] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
@@ -0,0 +1,33 @@
+import asyncio
+import sys
+
+from api.dry_run import get_dry_run_report, run_dry_run
+from common.utils import get_args
+from telegram.bot import bots
+from twitch.api import token_manager, twitch_client
+from twitch.thumbnails import thumbnails
+
+
+async def main(streamer_login: str, chats_count: int) -> None:
+    try:
+        report = await run_dry_run(streamer_login, chats_count)
+        print(get_dry_run_report(streamer_login, report))
+    finally:
+        await thumbnails.close()
+        token_manager.stop()
+        await twitch_client.close()
+        for shard_bot in bots:
+            await shard_bot.session.close()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    if not args.streamer:
+        print("Usage: python dry_run.py -E <env> -S <streamer login> [-N <chats>]")
+        sys.exit(1)
+
+    try:
+        asyncio.run(main(args.streamer, args.chats))
+    except KeyboardInterrupt:
+        print("KEYBOARD INTERRUPT")
+        sys.exit(1)
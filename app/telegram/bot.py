@@ -5,6 +5,8 @@ from common.config import cfg
 
 try:
     bot = Bot(token=cfg.TELEGRAM_TOKEN)
+    # primary bot goes first, only it gets updates and serves commands
+    bots = [bot, *(Bot(token=token) for token in cfg.TELEGRAM_SHARD_TOKENS)]
     dp = Dispatcher()
 except Exception as e:
     cfg.logger.error(str(e))
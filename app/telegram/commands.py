@@ -10,6 +10,7 @@ COMMANDS = [
     BotCommand(
         command="restreams_links", description="Change notification restreams links"
     ),
+    BotCommand(command="digest", description="Combine simultaneous notifications"),
     BotCommand(command="notification_test", description="Test notification"),
     BotCommand(
         command="online_streamers", description="Get currently online streamers"
@@ -30,6 +31,8 @@ COMMANDS_ADMIN = {
     "limites": "User's limites",
     "streamers": "List subscribed streamers",
     "costs": "Twitch API costs",
+    "stats": "Notifications latency",
+    "dry_run": "Test notification to synthetic chats: /dry_run <streamer> [chats]",
     "broadcast_message": "Broadcast message to all users",
     "version": "Bot version",
 }
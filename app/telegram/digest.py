@@ -0,0 +1,167 @@
+import asyncio
+from typing import Hashable
+
+from aiogram import methods, types
+from aiogram.methods import TelegramMethod
+from common.utils import create_background_task
+from telegram.outbound import PRIORITY_LIVE, OutboundManager
+from telegram.utils.render import get_text_length
+
+DIGEST_SEPARATOR = "\n\n"
+DIGEST_MAX_TEXT_LENGTH = 4096
+DIGEST_MAX_CAPTION_LENGTH = 1024
+DIGEST_MAX_MEDIA_GROUP = 10
+
+NotificationMethod = methods.SendMessage | methods.SendPhoto
+
+
+def get_method_text(
+    method: NotificationMethod,
+) -> tuple[str, list[types.MessageEntity]]:
+    if isinstance(method, methods.SendPhoto):
+        return method.caption or "", method.caption_entities or []
+    return method.text, method.entities or []
+
+
+def join_texts(
+    texts: list[tuple[str, list[types.MessageEntity]]],
+) -> tuple[str, list[types.MessageEntity]]:
+    joined_text = ""
+    joined_entities = []
+    for text, entities in texts:
+        if joined_text:
+            joined_text += DIGEST_SEPARATOR
+        offset = get_text_length(joined_text)
+        joined_entities.extend(
+            entity.model_copy(update={"offset": entity.offset + offset})
+            for entity in entities
+        )
+        joined_text += text
+    return joined_text, joined_entities
+
+
+class Digest:
+    def __init__(self, manager: OutboundManager, fair_key: Hashable) -> None:
+        self.manager = manager
+        self.fair_key = fair_key
+        self.items: list[tuple[NotificationMethod, asyncio.Future]] = []
+
+
+class DigestManager:
+    def __init__(self) -> None:
+        self.digests: dict[tuple[int, int], Digest] = {}
+
+    async def send(
+        self,
+        manager: OutboundManager,
+        method: NotificationMethod,
+        window: float,
+        fair_key: Hashable = None,
+    ) -> None:
+        # first notification opens window, all notifications to the chat
+        # until its end are sent together
+        key = (manager.bot.id, method.chat_id)
+        digest = self.digests.get(key)
+        if digest == None:
+            digest = Digest(manager, fair_key)
+            self.digests[key] = digest
+            create_background_task(self._flush(key, window))
+
+        future = asyncio.get_running_loop().create_future()
+        digest.items.append((method, future))
+        await future
+
+    def _combine(
+        self, items: list[tuple[NotificationMethod, asyncio.Future]]
+    ) -> list[tuple[TelegramMethod, list[asyncio.Future]]]:
+        if len(items) == 1:
+            method, future = items[0]
+            return [(method, [future])]
+
+        # only pictures are sent as media group, otherwise pictures are dropped
+        if all(isinstance(method, methods.SendPhoto) for method, _ in items):
+            return [
+                self._get_media_group(items[index : index + DIGEST_MAX_MEDIA_GROUP])
+                for index in range(0, len(items), DIGEST_MAX_MEDIA_GROUP)
+            ]
+
+        batches = []
+        batch = []
+        for item in items:
+            text, _ = join_texts(
+                [get_method_text(method) for method, _ in [*batch, item]]
+            )
+            if batch and get_text_length(text) > DIGEST_MAX_TEXT_LENGTH:
+                batches.append(batch)
+                batch = []
+            batch.append(item)
+        batches.append(batch)
+        return [self._get_message(batch) for batch in batches]
+
+    def _get_message(
+        self, items: list[tuple[NotificationMethod, asyncio.Future]]
+    ) -> tuple[TelegramMethod, list[asyncio.Future]]:
+        text, entities = join_texts([get_method_text(method) for method, _ in items])
+        method = methods.SendMessage(
+            chat_id=items[0][0].chat_id,
+            text=text,
+            entities=entities,
+            link_preview_options=types.LinkPreviewOptions(is_disabled=True),
+        )
+        return method, [future for _, future in items]
+
+    def _get_media_group(
+        self, items: list[tuple[NotificationMethod, asyncio.Future]]
+    ) -> tuple[TelegramMethod, list[asyncio.Future]]:
+        if len(items) == 1:
+            method, future = items[0]
+            return method, [future]
+
+        # all texts are shown under the album if they fit in one caption
+        caption, caption_entities = join_texts(
+            [get_method_text(method) for method, _ in items]
+        )
+        if get_text_length(caption) <= DIGEST_MAX_CAPTION_LENGTH:
+            media = [
+                types.InputMediaPhoto(
+                    media=items[0][0].photo,
+                    caption=caption,
+                    caption_entities=caption_entities,
+                ),
+                *[types.InputMediaPhoto(media=method.photo) for method, _ in items[1:]],
+            ]
+        else:
+            media = [
+                types.InputMediaPhoto(
+                    media=method.photo,
+                    caption=method.caption,
+                    caption_entities=method.caption_entities,
+                )
+                for method, _ in items
+            ]
+        method = methods.SendMediaGroup(chat_id=items[0][0].chat_id, media=media)
+        return method, [future for _, future in items]
+
+    async def _flush(self, key: tuple[int, int], window: float) -> None:
+        await asyncio.sleep(window)
+        digest = self.digests.pop(key)
+
+        for method, futures in self._combine(digest.items):
+            try:
+                await digest.manager.send(
+                    method,
+                    request_timeout=180.0,
+                    priority=PRIORITY_LIVE,
+                    fair_key=digest.fair_key,
+                )
+            except Exception as exc:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                for future in futures:
+                    if not future.done():
+                        future.set_result(None)
+
+
+digests = DigestManager()
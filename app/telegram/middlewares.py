@@ -1,8 +1,21 @@
 from typing import Any, Awaitable, Callable, Dict
 
-from aiogram import BaseMiddleware, types
+from aiogram import BaseMiddleware, Bot, types
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
 from common.config import cfg
 from telegram.commands import COMMANDS_ADMIN, get_command
+from telegram.outbound import (
+    EDIT_METHODS,
+    OUTBOUND_METHODS,
+    PRIORITY_INTERACTIVE,
+    get_outbound,
+    scheduled_request,
+)
 
 
 class ActiveBotMiddleware(BaseMiddleware):
@@ -65,3 +78,19 @@ class AdminMiddleware(BaseMiddleware):
             return
 
         return await handler(event, data)
+
+
+class OutboundRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        # interactive replies share rate limits with notifications
+        if not scheduled_request.get() and isinstance(method, OUTBOUND_METHODS):
+            chat_id = None
+            if not isinstance(method, EDIT_METHODS):
+                chat_id = getattr(method, "chat_id", None)
+            await get_outbound(bot.id).acquire(chat_id, PRIORITY_INTERACTIVE)
+        return await make_request(bot, method)
@@ -0,0 +1,342 @@
+import asyncio
+import random
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+from typing import Hashable, TypeVar
+
+from aiogram import Bot, methods, types
+from aiogram.enums import ChatMemberStatus
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import TelegramMethod
+from common.config import cfg
+from common.limiters import AdaptiveLimiter, TokenBucket
+from telegram.bot import bot, bots
+
+T = TypeVar("T")
+
+# idle mailboxes are kept this long, so their limits survive short pauses
+MAILBOX_TTL = 60.0
+# tokens of full bot bucket, bigger burst on top of refill goes over bot limit
+BOT_BUCKET_CAPACITY = 1
+# requests without chat pause whole bot on 429, but not longer than this
+BOT_PAUSE_MAX = 1.0
+RETRY_DELAY_BASE = 0.5
+RETRY_DELAY_MAX = 30.0
+
+# priority classes, lower is served first
+PRIORITY_LIVE = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BULK = 2
+
+SEND_FAILURE_DEAD = "dead"
+SEND_FAILURE_MIGRATED = "migrated"
+SEND_FAILURE_BAD_REQUEST = "bad request"
+SEND_FAILURE_OTHER = "other"
+
+# methods counted by Telegram message limits
+OUTBOUND_METHODS = (
+    methods.SendMessage,
+    methods.SendPhoto,
+    methods.SendDocument,
+    methods.SendMediaGroup,
+    methods.CopyMessage,
+    methods.ForwardMessage,
+    methods.EditMessageText,
+    methods.EditMessageCaption,
+    methods.EditMessageMedia,
+    methods.EditMessageReplyMarkup,
+)
+
+# edits don't add messages to chat, so they aren't limited per chat
+EDIT_METHODS = (
+    methods.EditMessageText,
+    methods.EditMessageCaption,
+    methods.EditMessageMedia,
+    methods.EditMessageReplyMarkup,
+)
+
+# uploads of all events go to storage chat, so it has own rate
+CHAT_TYPE_STORAGE = "storage"
+
+# set while request goes through OutboundManager, so middleware doesn't limit it twice
+scheduled_request: ContextVar[bool] = ContextVar("scheduled_request", default=False)
+
+
+def get_chat_type(chat_id: int) -> str:
+    if chat_id > 0:
+        return "private"
+    if str(chat_id).startswith("-100"):
+        return "channel"
+    return "group"
+
+
+def get_chat_rate(chat_type: str) -> float:
+    # Telegram limits are about 1 message per second in private chat
+    # and 20 messages per minute in groups and channels
+    if chat_type == CHAT_TYPE_STORAGE:
+        return cfg.TELEGRAM_RATE_LIMIT_STORAGE
+    if chat_type == "private":
+        return cfg.TELEGRAM_RATE_LIMIT_PRIVATE
+    return cfg.TELEGRAM_RATE_LIMIT_GROUP / 60
+
+
+def classify_send_failure(exc: Exception) -> str:
+    # kicked/blocked bot, deleted or never existed chat won't accept messages
+    if isinstance(exc, TelegramForbiddenError):
+        return SEND_FAILURE_DEAD
+    if isinstance(exc, TelegramMigrateToChat):
+        return SEND_FAILURE_MIGRATED
+    if isinstance(exc, TelegramBadRequest):
+        if "chat not found" in exc.message.lower():
+            return SEND_FAILURE_DEAD
+        return SEND_FAILURE_BAD_REQUEST
+    return SEND_FAILURE_OTHER
+
+
+def get_retry_delay(attempt: int) -> float:
+    # exponential backoff with full jitter
+    return random.uniform(0, min(RETRY_DELAY_MAX, RETRY_DELAY_BASE * 2**attempt))
+
+
+class Mailbox:
+    def __init__(self, chat_type: str) -> None:
+        self.chat_type = chat_type
+        self.bucket = TokenBucket(get_chat_rate(chat_type), 1)
+        self.pending = 0
+        self.used = time.monotonic()
+
+
+class OutboundManager:
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        # file_id is valid only for bot which uploaded it
+        self._files_ids: dict[str, asyncio.Task[str | None]] = {}
+        # Telegram limit is about 30 messages per second for one bot
+        self.bucket = TokenBucket(cfg.TELEGRAM_RATE_LIMIT, BOT_BUCKET_CAPACITY)
+        self.mailboxes: dict[int, Mailbox] = {}
+        self._swept = time.monotonic()
+        # parallel requests, adapted by Telegram 429 responses and latency
+        self.concurrency = AdaptiveLimiter(
+            cfg.TELEGRAM_CONCURRENCY_INITIAL,
+            cfg.TELEGRAM_CONCURRENCY_MIN,
+            cfg.TELEGRAM_CONCURRENCY_MAX,
+            cfg.TELEGRAM_CONCURRENCY_LATENCY,
+        )
+
+    def apply_limits(self) -> None:
+        self.bucket.set_rate(cfg.TELEGRAM_RATE_LIMIT, BOT_BUCKET_CAPACITY)
+        self.concurrency.set_bounds(
+            cfg.TELEGRAM_CONCURRENCY_MIN,
+            cfg.TELEGRAM_CONCURRENCY_MAX,
+            cfg.TELEGRAM_CONCURRENCY_LATENCY,
+        )
+        for mailbox in self.mailboxes.values():
+            mailbox.bucket.set_rate(get_chat_rate(mailbox.chat_type), 1)
+
+    def _get_mailbox(self, chat_id: int) -> Mailbox:
+        mailbox = self.mailboxes.get(chat_id)
+        if mailbox == None:
+            self._remove_idle_mailboxes()
+            chat_type = get_chat_type(chat_id)
+            if chat_id == cfg.TELEGRAM_STORAGE_CHAT_ID:
+                chat_type = CHAT_TYPE_STORAGE
+            mailbox = Mailbox(chat_type)
+            self.mailboxes[chat_id] = mailbox
+        return mailbox
+
+    def _remove_idle_mailboxes(self) -> None:
+        idle_time = time.monotonic() - MAILBOX_TTL
+        if self._swept > idle_time:
+            return
+        self._swept = time.monotonic()
+        for chat_id, mailbox in list(self.mailboxes.items()):
+            if mailbox.pending == 0 and mailbox.used < idle_time:
+                del self.mailboxes[chat_id]
+
+    async def _acquire(
+        self, mailbox: Mailbox | None, priority: int, fair_key: Hashable = None
+    ) -> None:
+        # chat limit first, so a busy chat doesn't hold global tokens
+        if mailbox:
+            await mailbox.bucket.acquire(priority)
+        await self.bucket.acquire(priority, fair_key)
+
+    async def acquire(self, chat_id: int | str | None, priority: int) -> None:
+        mailbox = None
+        if isinstance(chat_id, int):
+            mailbox = self._get_mailbox(chat_id)
+            mailbox.pending += 1
+        try:
+            await self._acquire(mailbox, priority)
+        finally:
+            if mailbox:
+                mailbox.pending -= 1
+                mailbox.used = time.monotonic()
+
+    async def _request(
+        self, method: TelegramMethod[T], request_timeout: float | None
+    ) -> T:
+        await self.concurrency.acquire()
+        started = time.monotonic()
+        throttled = False
+        try:
+            return await self.bot(method, request_timeout=request_timeout)
+        except TelegramRetryAfter:
+            throttled = True
+            raise
+        finally:
+            self.concurrency.release(time.monotonic() - started, throttled)
+            if throttled:
+                cfg.logger.warning(
+                    f"Outbound concurrency window: {self.concurrency.window:.1f}"
+                )
+
+    async def send(
+        self,
+        method: TelegramMethod[T],
+        request_timeout: float | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        fair_key: Hashable = None,
+    ) -> T:
+        # requests with different fair keys share global rate equally
+        chat_id = getattr(method, "chat_id", None)
+        mailbox = None
+        if isinstance(chat_id, int) and not isinstance(method, EDIT_METHODS):
+            mailbox = self._get_mailbox(chat_id)
+            mailbox.pending += 1
+
+        scheduled_token = scheduled_request.set(True)
+        try:
+            attempt = 1
+            while True:
+                try:
+                    await self._acquire(mailbox, priority, fair_key)
+                    return await self._request(method, request_timeout)
+                except TelegramRetryAfter as exc:
+                    if attempt >= cfg.TELEGRAM_RETRY_ATTEMPTS:
+                        raise
+                    cfg.logger.warning(
+                        f"Chat {chat_id} retry after {exc.retry_after}s ({attempt})"
+                    )
+                    # only throttled chat waits, bot limit is adapted by
+                    # concurrency window, so one slow chat doesn't stop others
+                    if mailbox:
+                        mailbox.bucket.pause(exc.retry_after)
+                    else:
+                        self.bucket.pause(min(exc.retry_after, BOT_PAUSE_MAX))
+                except (TelegramNetworkError, TelegramServerError) as exc:
+                    if attempt >= cfg.TELEGRAM_RETRY_ATTEMPTS:
+                        raise
+                    retry_delay = get_retry_delay(attempt)
+                    cfg.logger.warning(
+                        f"Chat {chat_id} retry in {retry_delay:.1f}s ({attempt}): {exc}"
+                    )
+                    await asyncio.sleep(retry_delay)
+                attempt += 1
+        finally:
+            scheduled_request.reset(scheduled_token)
+            if mailbox:
+                mailbox.pending -= 1
+                mailbox.used = time.monotonic()
+
+    async def upload_photo(self, photo: str | types.InputFile) -> str | None:
+        try:
+            uploaded_message = await self.send(
+                methods.SendPhoto(
+                    chat_id=cfg.TELEGRAM_STORAGE_CHAT_ID,
+                    photo=photo,
+                    disable_notification=True,
+                ),
+                request_timeout=180.0,
+                priority=PRIORITY_LIVE,
+            )
+        except Exception as exc:
+            cfg.logger.error(f"Bot {self.bot.id} picture upload error: {exc}")
+            return None
+
+        photo_id = None
+        file_size = 0
+        for photo_size in uploaded_message.photo:
+            if (photo_size.file_size or 0) > file_size:
+                file_size = photo_size.file_size
+                photo_id = photo_size.file_id
+
+        # file_id stays valid after deleting, so storage chat isn't spammed
+        with suppress(TelegramBadRequest):
+            await self.bot.delete_message(
+                chat_id=cfg.TELEGRAM_STORAGE_CHAT_ID,
+                message_id=uploaded_message.message_id,
+            )
+        return photo_id
+
+    async def _copy_file(self, file_id: str) -> str | None:
+        try:
+            downloaded_file = await bot.download(file_id)
+        except Exception as exc:
+            cfg.logger.error(f"Picture {file_id} download error: {exc}")
+            return None
+        return await self.upload_photo(
+            types.BufferedInputFile(downloaded_file.read(), filename=f"{file_id}.jpg")
+        )
+
+    async def get_file_id(self, file_id: str) -> str | None:
+        # converts primary bot file_id, every picture is copied once per bot
+        if self.bot.id == bot.id:
+            return file_id
+
+        task = self._files_ids.get(file_id)
+        if task == None:
+            task = asyncio.create_task(self._copy_file(file_id))
+            self._files_ids[file_id] = task
+        copied_file_id = await asyncio.shield(task)
+        if copied_file_id == None:
+            self._files_ids.pop(file_id, None)
+        return copied_file_id
+
+
+outbounds = {shard_bot.id: OutboundManager(shard_bot) for shard_bot in bots}
+outbound = outbounds[bot.id]
+
+
+def get_outbound(bot_id: int | None) -> OutboundManager:
+    return outbounds.get(bot_id, outbound)
+
+
+async def find_chat_bot(chat_id: int) -> int | None:
+    # private chats are started with primary bot only
+    if len(bots) == 1 or get_chat_type(chat_id) == "private":
+        return bot.id
+
+    statuses = (
+        ChatMemberStatus.CREATOR,
+        ChatMemberStatus.ADMINISTRATOR,
+        ChatMemberStatus.MEMBER,
+    )
+    members_bots = []
+    for shard_bot in bots[1:]:
+        # checks share shard bot limit with its messages, but don't delay them
+        await outbounds[shard_bot.id].acquire(None, PRIORITY_BULK)
+        try:
+            member = await shard_bot.get_chat_member(chat_id, shard_bot.id)
+        except (TelegramBadRequest, TelegramForbiddenError):
+            # bot isn't in chat or chat isn't available for it
+            continue
+        except TelegramAPIError as exc:
+            # throttled or network error isn't an answer, chat isn't pinned
+            cfg.logger.warning(f"Chat {chat_id} membership check error: {exc}")
+            return None
+        if member.status in statuses:
+            members_bots.append(shard_bot.id)
+    if not members_bots:
+        return bot.id
+    # chats are spread between shards which are members of them
+    return members_bots[chat_id % len(members_bots)]
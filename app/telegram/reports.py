@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from aiogram import methods
+from common.config import cfg
+from common.utils import create_background_task
+from telegram.outbound import PRIORITY_BULK, PRIORITY_INTERACTIVE, outbound
+
+ERROR_SAMPLES = 3
+# error kind is new again if it wasn't seen for this time
+ERROR_KIND_TTL = 24 * 3600.0
+# new kinds are sent right away not more often than once per interval,
+# other ones wait for the report
+ERROR_ESCALATION_INTERVAL = 60.0
+ERROR_REPORT_MAX_LENGTH = 4096
+
+
+class ErrorGroup:
+    def __init__(self) -> None:
+        self.count = 0
+        self.samples: list[str] = []
+
+
+class ErrorReporter:
+    def __init__(self) -> None:
+        self.groups: dict[tuple[str, str, str], ErrorGroup] = {}
+        self._known_kinds: dict[str, float] = {}
+        self._escalated = 0.0
+        self._task: asyncio.Task | None = None
+
+    def report(
+        self,
+        kind: str,
+        error: Exception | str,
+        streamer: str = "",
+        chat: int | str = "",
+    ) -> None:
+        if isinstance(error, Exception):
+            kind = f"{kind} ({type(error).__name__})"
+        error_text = str(error)
+
+        # escalated errors are in the report too
+        group = self.groups.setdefault((kind, str(streamer), str(chat)), ErrorGroup())
+        group.count += 1
+        if len(group.samples) < ERROR_SAMPLES and error_text not in group.samples:
+            group.samples.append(error_text)
+
+        now = time.monotonic()
+        known_time = self._known_kinds.get(kind)
+        self._known_kinds[kind] = now
+        if (
+            known_time == None or now - known_time > ERROR_KIND_TTL
+        ) and now - self._escalated >= ERROR_ESCALATION_INTERVAL:
+            self._escalated = now
+            source = " ".join(str(part) for part in (streamer, chat) if part)
+            create_background_task(
+                self._send(
+                    f"ADMIN MESSAGE\nNEW ERROR\n{kind}\nFROM {source}\n{error_text}",
+                    PRIORITY_INTERACTIVE,
+                )
+            )
+
+    async def _send(self, text: str, priority: int) -> None:
+        if cfg.ENV == "dev":
+            return
+        try:
+            await outbound.send(
+                methods.SendMessage(
+                    chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
+                    text=text[:ERROR_REPORT_MAX_LENGTH],
+                ),
+                priority=priority,
+            )
+        except Exception as exc:
+            cfg.logger.error(f"Error report sending error: {exc}")
+
+    async def flush(self) -> None:
+        if not self.groups:
+            return
+        groups, self.groups = self.groups, {}
+
+        report_text = "ADMIN MESSAGE\nERRORS REPORT"
+        for (kind, streamer, chat), group in sorted(
+            groups.items(), key=lambda item: item[1].count, reverse=True
+        ):
+            source = " ".join(part for part in (streamer, chat) if part)
+            report_text += f"\n● {kind} FROM {source}: {group.count}"
+            for sample in group.samples:
+                report_text += f"\n○ {sample}"
+        await self._send(report_text, PRIORITY_BULK)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(cfg.TELEGRAM_ERROR_REPORT_WINDOW)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+
+
+error_reporter = ErrorReporter()
@@ -5,17 +5,21 @@ from contextlib import suppress
 from copy import copy
 from datetime import datetime, timezone
 
-from aiogram import Bot, F, Router, types
+from aiogram import Bot, F, Router, methods, types
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
+from api.dry_run import get_dry_run_report, run_dry_run
 from common.config import cfg
+from common.stats import notification_stats
+from common.utils import create_background_task
 from crud import admin as crud_admin
 from crud import chats as crud_chats
 from crud import streamers as crud_streamers
 from crud import subscriptions as crud_subs
 from crud import users as crud_users
 from telegram.commands import COMMANDS_ADMIN
+from telegram.outbound import PRIORITY_BULK, outbound, outbounds
 from telegram.utils.callbacks import (
     CallbackChooseUser,
     CallbackDump,
@@ -91,6 +95,8 @@ async def secrets_reload_handler(message: types.Message):
             cfg.logger.error(f"No secrets found: {no_secrets}")
             message_text = f"No secrets found:\n{str(no_secrets)}"
         else:
+            for shard_outbound in outbounds.values():
+                shard_outbound.apply_limits()
             cfg.logger.info("Secrets were reloaded")
     with suppress(TelegramBadRequest):
         await message.answer(text=message_text)
@@ -366,19 +372,24 @@ async def limit_default_callback_update_users(
     update_result, updated_users = await cfg.update_limit_default(value, users_update)
     message_text = f"Default limit was changed\nFor {updated_users}"
     error_users = {}
-    for user in updated_users:
+
+    async def notify_user(user: int) -> None:
         try:
             await crud_users.update_user(user, {"limit": cfg.TELEGRAM_LIMIT_DEFAULT})
             with suppress(TelegramBadRequest):
-                await bot.send_message(
-                    chat_id=user,
-                    text=f"Your limit was changed from {old_limit} to {cfg.TELEGRAM_LIMIT_DEFAULT}",
+                await outbound.send(
+                    methods.SendMessage(
+                        chat_id=user,
+                        text=f"Your limit was changed from {old_limit} to {cfg.TELEGRAM_LIMIT_DEFAULT}",
+                    ),
+                    priority=PRIORITY_BULK,
                 )
         except Exception as exc:
             error_users[user] = str(exc)
             cfg.logger.error(f"User {user} error: {exc}")
             traceback.print_exception(exc)
-        await asyncio.sleep(1)
+
+    await asyncio.gather(*[notify_user(user) for user in updated_users])
 
     if cfg.ENV != "dev" and error_users:
         with suppress(TelegramBadRequest):
@@ -386,7 +397,6 @@ async def limit_default_callback_update_users(
                 [f"{chat}: {err}" for chat, err in error_users.items()]
             )
             await callback.message.answer(text=f"MESSAGE ERROR\n{error_string}")
-        await asyncio.sleep(1)
 
     if update_result:
         message_text = f"Setting new default limit error:\n{update_result}"
@@ -582,6 +592,54 @@ async def costs_handler(message: types.Message):
         await message.answer(text=message_text)
 
 
+@router.message(Command("stats"))
+async def stats_handler(message: types.Message):
+    # seconds since webhook receipt
+    message_text = "Notifications latency (p50 / p95 / p99):"
+    for stage, stage_stats in notification_stats.get_report().items():
+        message_text += (
+            f"\n● {stage} ({stage_stats['count']})\n○ "
+            f"{stage_stats['p50']:.2f}s / "
+            f"{stage_stats['p95']:.2f}s / "
+            f"{stage_stats['p99']:.2f}s"
+        )
+    for shard_outbound in outbounds.values():
+        message_text += (
+            f"\n● bot {shard_outbound.bot.id} concurrency\n○ "
+            f"{shard_outbound.concurrency.window:.1f}"
+        )
+
+    with suppress(TelegramBadRequest):
+        await message.answer(text=message_text)
+
+
+@router.message(Command("dry_run"))
+async def dry_run_handler(message: types.Message, command: CommandObject):
+    try:
+        streamer_login, *chats_count = (command.args or "").split()
+        chats_count = int(chats_count[0]) if chats_count else 1000
+    except ValueError:
+        with suppress(TelegramBadRequest):
+            await message.answer(text="Usage: /dry_run <streamer> [chats]")
+        return
+
+    async def dry_run() -> None:
+        try:
+            report = await run_dry_run(streamer_login.lower(), chats_count)
+            message_text = get_dry_run_report(streamer_login, report)
+        except Exception as exc:
+            cfg.logger.error(f"Dry run error: {exc}")
+            traceback.print_exception(exc)
+            message_text = f"Dry run error: {exc}"
+        with suppress(TelegramBadRequest):
+            await message.answer(text=message_text)
+
+    # dispatch takes minutes for thousands of chats, webhook isn't held
+    create_background_task(dry_run())
+    with suppress(TelegramBadRequest):
+        await message.answer(text=f"Dry run of {streamer_login} was started")
+
+
 @router.message(Command("dump"))
 async def dump_handler(message: types.Message):
     main_keyboard = get_keyboard_dump()
@@ -702,32 +760,45 @@ async def broadcast_message_form(
         admin_message = "Can't send empty message"
     else:
         error_users = {}
-        for user_id in cfg.TELEGRAM_USERS:
-            if user_id != cfg.TELEGRAM_BOT_OWNER_ID:
-                try:
-                    if picture_id:
-                        with suppress(TelegramBadRequest):
-                            await bot.send_photo(
+
+        async def notify_user(user_id: int) -> None:
+            try:
+                if picture_id:
+                    with suppress(TelegramBadRequest):
+                        await outbound.send(
+                            methods.SendPhoto(
                                 chat_id=user_id,
                                 photo=picture_id,
                                 caption=message_text,
                                 caption_entities=message_entities,
-                            )
-                    else:
-                        with suppress(TelegramBadRequest):
-                            await bot.send_message(
+                            ),
+                            priority=PRIORITY_BULK,
+                        )
+                else:
+                    with suppress(TelegramBadRequest):
+                        await outbound.send(
+                            methods.SendMessage(
                                 chat_id=user_id,
                                 text=message_text,
                                 entities=message_entities,
                                 link_preview_options=types.LinkPreviewOptions(
                                     is_disabled=True
                                 ),
-                            )
-                except Exception as exc:
-                    error_users[user_id] = str(exc)
-                    cfg.logger.error(f"User {user_id} error: {exc}")
-                    traceback.print_exception(exc)
-                await asyncio.sleep(1)
+                            ),
+                            priority=PRIORITY_BULK,
+                        )
+            except Exception as exc:
+                error_users[user_id] = str(exc)
+                cfg.logger.error(f"User {user_id} error: {exc}")
+                traceback.print_exception(exc)
+
+        await asyncio.gather(
+            *[
+                notify_user(user_id)
+                for user_id in cfg.TELEGRAM_USERS
+                if user_id != cfg.TELEGRAM_BOT_OWNER_ID
+            ]
+        )
 
         if cfg.ENV != "dev" and error_users:
             with suppress(TelegramBadRequest):
@@ -735,7 +806,6 @@ async def broadcast_message_form(
                     [f"{chat}: {err}" for chat, err in error_users.items()]
                 )
                 await message.answer(text=f"MESSAGE ERROR\n{error_string}")
-            await asyncio.sleep(1)
 
     with suppress(TelegramBadRequest):
         await message.answer(text=admin_message)
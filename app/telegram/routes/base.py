@@ -32,6 +32,7 @@ async def start_handler(message: types.Message, bot: Bot):
     admin_message_text = ""
     if user_id in cfg.TELEGRAM_USERS:
         message_text = "Bot already started"
+        await crud_chats.activate_chat(chat_id)
     else:
         join_code = message.text.removeprefix("/start").strip()
         if await cfg.check_invite_code(join_code):
@@ -178,6 +179,10 @@ async def info_handler(message: types.Message, bot: Bot):
             "Stream start screenshot, Own picture or Disabled"
         ),
         "Change notification restreams links via /restreams_links",
+        (
+            "Combine notifications of streams started at the same time "
+            "into one message: /digest"
+        ),
         "Other commands can be found in command menu near text-input",
         marker="● ",
     )
@@ -200,6 +205,7 @@ async def abort_handler(
         TMPLT = "Changing template operation was aborted"
         PCTR = "Changing picture mode operation was aborted"
         RSTRML = "Changing restreams links operation was aborted"
+        DGST = "Changing digest window operation was aborted"
         NTFCTN = "Testing notification operation was aborted"
 
         USRS = ""
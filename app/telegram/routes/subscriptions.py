@@ -2,7 +2,6 @@ from collections import namedtuple
 from contextlib import suppress
 from datetime import datetime, timezone
 from enum import Enum
-from string import Template
 
 from aiogram import Bot, F, Router, types
 from aiogram.exceptions import TelegramBadRequest
@@ -19,6 +18,7 @@ from telegram.utils.callbacks import (
     CallbackChooseChannel,
     CallbackChooseChat,
     CallbackChooseStreamer,
+    CallbackDigest,
     CallbackPicture,
     CallbackRestreamsLinks,
     CallbackTemplateMode,
@@ -35,11 +35,13 @@ from telegram.utils.keyboards import (
     get_keyboard_channels,
     get_keyboard_channels_remove,
     get_keyboard_chats,
+    get_keyboard_digest,
     get_keyboard_picture,
     get_keyboard_restreams_links,
     get_keyboard_streamers,
     get_keyboard_template_mode,
 )
+from telegram.utils.render import render_notification
 from twitch import functions as twitch
 
 router = Router()
@@ -131,6 +133,7 @@ async def user_channel_remove_handler(
 @router.message(Command("template"))
 @router.message(Command("picture"))
 @router.message(Command("restreams_links"))
+@router.message(Command("digest"))
 @router.message(Command("notification_test"))
 async def chats_handler(message: types.Message, bot: Bot):
     command = get_command(message.text)
@@ -145,6 +148,7 @@ async def chats_handler(message: types.Message, bot: Bot):
         TEMPLATE = ACTONS_TEXTS("tmplt", "Change notification template")
         PICTURE = ACTONS_TEXTS("pctr", "Change notification picture mode")
         RESTREAMS_LINKS = ACTONS_TEXTS("rstrml", "Change notification restreams links")
+        DIGEST = ACTONS_TEXTS("dgst", "Change notification digest window")
         NOTIFICATION_TEST = ACTONS_TEXTS("ntfctn", "Test notification")
 
     action, action_string = ACTONS[command.upper()].value
@@ -684,19 +688,13 @@ async def notification_test_message_handler(
     stream_category = stream_info.get("category", default_category) or default_category
     stream_details = f"\n● {stream_title}\n○ {stream_category}\n"
 
-    template = Template(sub_template or "$streamer_name is live")
-    filled_template = template.safe_substitute({"streamer_name": streamer_name})
-    if sub_template == "":
-        filled_template = ""
-
-    links = [f"twitch.tv/{streamer_login}", *(sub_restreams_links or [])]
-
-    message = formatting.Text(
-        formatting.Bold(filled_template) if filled_template else "",
-        f"\n{stream_details}\n",
-        formatting.Bold("\n".join(links)),
+    message_text, message_entities = render_notification(
+        sub_template,
+        tuple(sub_restreams_links or []),
+        streamer_name,
+        streamer_login,
+        stream_details,
     )
-    message_text, message_entities = message.render()
 
     if sub_picture_mode == "Disabled":
         with suppress(TelegramBadRequest):
@@ -916,3 +914,50 @@ async def restreams_links_streamer_form(
         await crud_subs.change_restreams_links(chat_id, streamer_id, links)
     with suppress(TelegramBadRequest):
         await message.answer(text=message_text)
+
+
+@router.callback_query(CallbackChooseChat.filter(F.action == "dgst"))
+async def digest_handler(
+    callback: types.CallbackQuery, callback_data: CallbackChooseChat
+):
+    chat_id = callback_data.id
+    chat_name = get_choosed_callback_text(
+        callback.message.reply_markup.inline_keyboard, callback.data
+    )
+
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(
+            text=f"Change notification digest window\n'{chat_name}' choosen",
+            reply_markup=None,
+        )
+    digest_window = await crud_chats.get_digest_window(chat_id)
+    window_name = f"{digest_window} s" if digest_window else "Disabled"
+    main_keyboard = get_keyboard_digest(chat_id)
+    main_keyboard.adjust(5)
+    abort_keyboard = get_keyboard_abort(callback_data.action)
+    main_keyboard.attach(abort_keyboard)
+    with suppress(TelegramBadRequest):
+        await callback.message.answer(
+            text=(
+                "Notifications of streams started within window "
+                "are sent as one message\n"
+                f"Current window: {window_name}"
+            ),
+            reply_markup=main_keyboard.as_markup(),
+        )
+
+
+@router.callback_query(CallbackDigest.filter())
+async def digest_window_handler(
+    callback: types.CallbackQuery, callback_data: CallbackDigest
+):
+    window_name = get_choosed_callback_text(
+        callback.message.reply_markup.inline_keyboard, callback.data
+    )
+
+    await crud_chats.change_digest_window(callback_data.chat_id, callback_data.window)
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(
+            text=f"New digest window ('{window_name}') was set",
+            reply_markup=None,
+        )
@@ -0,0 +1,91 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+from aiogram import methods, types
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from common.config import cfg
+from telegram.outbound import OUTBOUND_METHODS, get_chat_type
+
+# real Telegram limits, not configured ones, so dry run shows if config fits them
+STUB_BOT_LIMIT = (30, 1.0)
+STUB_PRIVATE_CHAT_LIMIT = (1, 1.0)
+STUB_GROUP_CHAT_LIMIT = (20, 60.0)
+STUB_LATENCY = (0.05, 0.25)
+
+
+class StubBot:
+    # answers like Telegram Bot API without requests, counts 429 responses
+    # and delivery times of messages
+    def __init__(self, bot_id: int) -> None:
+        self.id = bot_id
+        self.delivered: list[float] = []
+        self.throttled = 0
+        self._sent: dict[int | str | None, deque[float]] = {}
+        self._message_id = 0
+
+    def _check_limit(
+        self, method: TelegramMethod, key: int | str | None, limit: tuple[int, float]
+    ) -> None:
+        count, period = limit
+        now = time.monotonic()
+        sent = self._sent.setdefault(key, deque())
+        while sent and now - sent[0] >= period:
+            sent.popleft()
+        if len(sent) >= count:
+            self.throttled += 1
+            raise TelegramRetryAfter(
+                method=method,
+                message="Too Many Requests: dry run",
+                retry_after=math.ceil(period - (now - sent[0])),
+            )
+
+    def _get_message(self, chat_id: int, method: TelegramMethod) -> types.Message:
+        self._message_id += 1
+        photo = None
+        if isinstance(method, (methods.SendPhoto, methods.EditMessageMedia)):
+            photo = [
+                types.PhotoSize(
+                    file_id=f"dry_run_{self.id}",
+                    file_unique_id=f"dry_run_{self.id}",
+                    width=cfg.TWITCH_THUMBNAIL_WIDTH,
+                    height=cfg.TWITCH_THUMBNAIL_HEIGHT,
+                    file_size=1,
+                )
+            ]
+        return types.Message(
+            message_id=self._message_id,
+            date=datetime.now(tz=timezone.utc),
+            chat=types.Chat(id=chat_id, type=get_chat_type(chat_id)),
+            text=getattr(method, "text", None),
+            entities=getattr(method, "entities", None),
+            photo=photo,
+        )
+
+    async def __call__(
+        self, method: TelegramMethod, request_timeout: float | None = None
+    ) -> Any:
+        await asyncio.sleep(random.uniform(*STUB_LATENCY))
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(method, OUTBOUND_METHODS) and isinstance(chat_id, int):
+            chat_limit = STUB_GROUP_CHAT_LIMIT
+            if get_chat_type(chat_id) == "private":
+                chat_limit = STUB_PRIVATE_CHAT_LIMIT
+            self._check_limit(method, chat_id, chat_limit)
+            self._check_limit(method, None, STUB_BOT_LIMIT)
+            self._sent[chat_id].append(time.monotonic())
+            self._sent[None].append(time.monotonic())
+
+        if chat_id != cfg.TELEGRAM_STORAGE_CHAT_ID:
+            self.delivered.append(time.monotonic())
+        if isinstance(method, methods.SendMediaGroup):
+            return [self._get_message(chat_id, method) for _ in method.media]
+        return self._get_message(chat_id, method)
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        return True
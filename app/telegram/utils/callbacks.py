@@ -41,6 +41,11 @@ class CallbackRestreamsLinks(CallbackData, prefix="rsl"):
     chat_id: int
 
 
+class CallbackDigest(CallbackData, prefix="dgst"):
+    window: int
+    chat_id: int
+
+
 class CallbackUsersAction(CallbackData, prefix="usrsact"):
     action: str
 
@@ -7,6 +7,7 @@ from telegram.utils.callbacks import (
     CallbackChooseChat,
     CallbackChooseStreamer,
     CallbackChooseUser,
+    CallbackDigest,
     CallbackDump,
     CallbackLimitDefault,
     CallbackLimitDefaultUsersUpdate,
@@ -91,6 +92,16 @@ def get_keyboard_restreams_links(
     return keyboard
 
 
+def get_keyboard_digest(chat_id: int) -> InlineKeyboardBuilder:
+    keyboard = InlineKeyboardBuilder()
+    for window in (0, 15, 30, 60, 120):
+        keyboard.button(
+            text=f"{window} s" if window else "Disabled",
+            callback_data=CallbackDigest(window=window, chat_id=chat_id),
+        )
+    return keyboard
+
+
 def get_keyboard_users_actions() -> InlineKeyboardBuilder:
     keyboard = InlineKeyboardBuilder()
     for action in ("Invite", "Rename", "Remove"):
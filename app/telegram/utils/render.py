@@ -0,0 +1,71 @@
+from functools import lru_cache
+from string import Template
+
+from aiogram import types
+from aiogram.enums import MessageEntityType
+
+TEMPLATE_CACHE_SIZE = 256
+DEFAULT_TEMPLATE = "$streamer_name is live"
+
+
+def get_text_length(text: str) -> int:
+    # Telegram counts lengths and entities offsets in UTF-16 code units
+    return len(text.encode("utf-16-le")) // 2
+
+
+class CompiledTemplate:
+    # notification is bold title, stream details and bold links,
+    # only streamer name, login and details change between renders
+    def __init__(self, template: str | None, restreams_links: tuple[str, ...]) -> None:
+        # empty template disables title, None is default one
+        self.template = None
+        if template != "":
+            self.template = Template(template or DEFAULT_TEMPLATE)
+        self.links_suffix = "".join(f"\n{link}" for link in restreams_links)
+
+    def render(
+        self, streamer_name: str, streamer_login: str, stream_details: str
+    ) -> tuple[str, list[types.MessageEntity]]:
+        title = ""
+        if self.template:
+            title = self.template.safe_substitute({"streamer_name": streamer_name})
+        links = f"twitch.tv/{streamer_login}{self.links_suffix}"
+        text = f"{title}\n{stream_details}\n{links}"
+
+        entities = []
+        if title:
+            entities.append(
+                types.MessageEntity(
+                    type=MessageEntityType.BOLD,
+                    offset=0,
+                    length=get_text_length(title),
+                )
+            )
+        links_length = get_text_length(links)
+        entities.append(
+            types.MessageEntity(
+                type=MessageEntityType.BOLD,
+                offset=get_text_length(text) - links_length,
+                length=links_length,
+            )
+        )
+        return text, entities
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(
+    template: str | None, restreams_links: tuple[str, ...]
+) -> CompiledTemplate:
+    return CompiledTemplate(template, restreams_links)
+
+
+def render_notification(
+    template: str | None,
+    restreams_links: tuple[str, ...],
+    streamer_name: str,
+    streamer_login: str,
+    stream_details: str,
+) -> tuple[str, list[types.MessageEntity]]:
+    return compile_template(template, restreams_links).render(
+        streamer_name, streamer_login, stream_details
+    )
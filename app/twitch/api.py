@@ -1,8 +1,12 @@
-from datetime import datetime, timezone
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from contextvars import ContextVar
 
 import httpx
 from common.config import cfg
-from telegram.bot import bot
+from common.limiters import TokenBucket
+from telegram.reports import error_reporter
 
 ROUTE_OAUTH2_TOKEN = "https://id.twitch.tv/oauth2/token"
 ROUTE_USERS = "https://api.twitch.tv/helix/users"
@@ -10,11 +14,156 @@ ROUTE_STREAMS = "https://api.twitch.tv/helix/streams"
 ROUTE_CHANNELS = "https://api.twitch.tv/helix/channels"
 ROUTE_EVENTS_SUBSCRIPTIONS = "https://api.twitch.tv/helix/eventsub/subscriptions"
 
+# token is refreshed in background this long before expiry,
+# and counted as expired this long before it
+TOKEN_REFRESH_MARGIN = 600.0
+TOKEN_EXPIRY_MARGIN = 60.0
+TOKEN_RETRY_DELAY = 60.0
+
+# Helix bucket of app token until first answer tells real one
+HELIX_DEFAULT_LIMIT = 800
+HELIX_LIMIT_PERIOD = 60.0
+# points left only for notification calls
+HELIX_LIVE_RESERVE = 50
+HELIX_RETRY_ATTEMPTS = 3
+
+# priority classes, lower is served first
+HELIX_PRIORITY_LIVE = 0
+HELIX_PRIORITY_INTERACTIVE = 1
+HELIX_PRIORITY_BULK = 2
+
+# set by caller of request, read by client auth flow
+helix_priority: ContextVar[int] = ContextVar(
+    "helix_priority", default=HELIX_PRIORITY_INTERACTIVE
+)
+
+
+class HelixLimiter:
+    # client side copy of Helix points bucket, synced by Ratelimit headers
+    def __init__(self) -> None:
+        self.limit = HELIX_DEFAULT_LIMIT
+        self.remaining = HELIX_DEFAULT_LIMIT
+        self._reset = 0.0
+        self.bucket = TokenBucket(HELIX_DEFAULT_LIMIT / HELIX_LIMIT_PERIOD, self.limit)
+
+    async def acquire(self, priority: int) -> None:
+        # almost empty bucket is left for notifications until reset
+        while True:
+            await self.bucket.acquire(priority)
+            reset_delay = self._reset - time.monotonic()
+            if (
+                priority == HELIX_PRIORITY_LIVE
+                or self.remaining > HELIX_LIVE_RESERVE
+                or reset_delay <= 0
+            ):
+                return
+            await asyncio.sleep(reset_delay)
+
+    def update(self, response: httpx.Response) -> None:
+        try:
+            limit = int(response.headers["Ratelimit-Limit"])
+            self.remaining = int(response.headers["Ratelimit-Remaining"])
+            reset_delay = float(response.headers["Ratelimit-Reset"]) - time.time()
+        except (KeyError, ValueError):
+            return
+        self._reset = time.monotonic() + max(reset_delay, 0)
+
+        if limit != self.limit:
+            self.limit = limit
+            self.bucket.set_rate(limit / HELIX_LIMIT_PERIOD, limit)
+        # bucket is empty until reset, all calls wait for it
+        if response.status_code == 429 or self.remaining == 0:
+            cfg.logger.warning(f"Helix rate limit, reset in {reset_delay:.1f}s")
+            self.bucket.pause(max(reset_delay, 1.0))
+
+
+helix_limiter = HelixLimiter()
+
+
+class HelixAuth(httpx.Auth):
+    # token is checked before every request, 401 refreshes it and repeats once,
+    # 429 repeats request after rate limit reset
+    requires_request_body = True
+
+    async def async_auth_flow(
+        self, request: httpx.Request
+    ) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        priority = helix_priority.get()
+        token = await token_manager.get_token()
+        request.headers["Client-Id"] = cfg.TWITCH_CLIENT_ID
+        refreshed = False
+        attempt = 1
+        while True:
+            request.headers["Authorization"] = f"Bearer {token}"
+            await helix_limiter.acquire(priority)
+            response = yield request
+            helix_limiter.update(response)
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                await token_manager.refresh(token)
+                token = cfg.TWITCH_BEARER
+            elif response.status_code == 429 and attempt < HELIX_RETRY_ATTEMPTS:
+                attempt += 1
+            else:
+                return
+
+
+class TwitchClient:
+    # one client for all Helix calls, so connections are reused
+    # instead of new TCP and TLS handshake on every call
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+
+    def open(self) -> None:
+        if self._client == None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                auth=HelixAuth(),
+                http2=True,
+                timeout=httpx.Timeout(5.0, connect=3.0),
+                limits=httpx.Limits(
+                    max_connections=50,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=60.0,
+                ),
+            )
+
+    def get_client(self) -> httpx.AsyncClient:
+        # opened lazily outside app lifespan, e.g. by dry run
+        self.open()
+        return self._client
+
+    async def close(self) -> None:
+        if self._client:
+            await self._client.aclose()
+
+
+twitch_client = TwitchClient()
+
 
-async def _auth() -> None:
-    try:
-        async with httpx.AsyncClient() as ac:
-            answer = await ac.post(
+class TokenManager:
+    # one token request at a time, concurrent calls wait for its result
+    def __init__(self) -> None:
+        self._expires = 0.0
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._timer_task: asyncio.Task[None] | None = None
+
+    async def get_token(self) -> str:
+        if cfg.TWITCH_BEARER == "NONE" or time.monotonic() >= self._expires:
+            await self.refresh()
+        return cfg.TWITCH_BEARER
+
+    async def refresh(self, stale_token: str | None = None) -> None:
+        # stale token was already replaced by another call
+        if stale_token != None and stale_token != cfg.TWITCH_BEARER:
+            return
+        if self._refresh_task == None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> None:
+        refresh_delay = TOKEN_RETRY_DELAY
+        try:
+            answer = await twitch_client.get_client().post(
                 ROUTE_OAUTH2_TOKEN,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
                 data={
@@ -22,95 +171,76 @@ async def _auth() -> None:
                     "client_secret": cfg.TWITCH_CLIENT_SECRET,
                     "grant_type": "client_credentials",
                 },
+                auth=None,
             )
             if answer.status_code != 200:
                 raise Exception(f"Response: {answer.status_code}")
-            cfg.TWITCH_BEARER = answer.json()["access_token"]
-    except Exception as e:
-        cfg.logger.error(f"Twitch auth error {str(e)}")
-        if cfg.ENV != "dev":
-            datetime_utc_now = datetime.now(tz=timezone.utc).isoformat()
-            await bot.send_message(
-                chat_id=cfg.TELEGRAM_BOT_OWNER_ID,
-                text=f"ADMIN MESSAGE\nTWITCH AUTH FAILED at {datetime_utc_now}\n{str(e)}",
-            )
+            answer_json = answer.json()
+            expires_in = float(answer_json.get("expires_in", 0))
+            cfg.TWITCH_BEARER = answer_json["access_token"]
+            self._expires = time.monotonic() + expires_in - TOKEN_EXPIRY_MARGIN
+            refresh_delay = max(expires_in - TOKEN_REFRESH_MARGIN, TOKEN_RETRY_DELAY)
+        except Exception as e:
+            cfg.logger.error(f"Twitch auth error {str(e)}")
+            error_reporter.report("TWITCH AUTH FAILED", e)
+        self._schedule(refresh_delay)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer_task:
+            self._timer_task.cancel()
+        self._timer_task = asyncio.create_task(self._refresh_later(delay))
+
+    async def _refresh_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.refresh()
+
+    def start(self) -> None:
+        # first token is requested before first notification needs it
+        self._schedule(0)
+
+    def stop(self) -> None:
+        if self._timer_task:
+            self._timer_task.cancel()
+
+
+token_manager = TokenManager()
 
 
 async def _get_streamers_info(params: dict[str, str | list[str]]) -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.get(
-            ROUTE_USERS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-            params=params,
-        )
+    return await twitch_client.get_client().get(ROUTE_USERS, params=params)
 
 
 async def _get_streams_info(params: dict[str, str | list[str]]) -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.get(
-            ROUTE_STREAMS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-            params=params,
-        )
+    return await twitch_client.get_client().get(ROUTE_STREAMS, params=params)
 
 
 async def _get_channel_info(streamer_id: str) -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.get(
-            ROUTE_CHANNELS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-            params={"broadcaster_id": streamer_id},
-        )
+    return await twitch_client.get_client().get(
+        ROUTE_CHANNELS, params={"broadcaster_id": streamer_id}
+    )
 
 
 async def _subscribe_event(streamer_id: str, event_type: str) -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.post(
-            ROUTE_EVENTS_SUBSCRIPTIONS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-            json={
-                "type": event_type,
-                "version": "1",
-                "condition": {"broadcaster_user_id": streamer_id},
-                "transport": {
-                    "method": "webhook",
-                    "callback": f"https://{cfg.DOMAIN}/webhooks/twitch/stream-online",
-                    "secret": cfg.TWITCH_SUBSCRIPTION_SECRET,
-                },
+    return await twitch_client.get_client().post(
+        ROUTE_EVENTS_SUBSCRIPTIONS,
+        json={
+            "type": event_type,
+            "version": "1",
+            "condition": {"broadcaster_user_id": streamer_id},
+            "transport": {
+                "method": "webhook",
+                "callback": f"https://{cfg.DOMAIN}/webhooks/twitch/stream-online",
+                "secret": cfg.TWITCH_SUBSCRIPTION_SECRET,
             },
-        )
+        },
+    )
 
 
 async def _unsubscribe_event(event_id: str) -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.delete(
-            ROUTE_EVENTS_SUBSCRIPTIONS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-            params={"id": event_id},
-        )
+    return await twitch_client.get_client().delete(
+        ROUTE_EVENTS_SUBSCRIPTIONS, params={"id": event_id}
+    )
 
 
 async def _get_costs() -> httpx.Response:
-    async with httpx.AsyncClient() as ac:
-        return await ac.get(
-            ROUTE_EVENTS_SUBSCRIPTIONS,
-            headers={
-                "Client-Id": cfg.TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {cfg.TWITCH_BEARER}",
-            },
-        )
+    return await twitch_client.get_client().get(ROUTE_EVENTS_SUBSCRIPTIONS)
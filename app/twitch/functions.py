@@ -1,29 +1,47 @@
+import asyncio
 from collections.abc import Awaitable, Callable
 
 from common.config import cfg
+from common.utils import create_background_task
 from httpx import Response
 from twitch.api import (
-    _auth,
+    HELIX_PRIORITY_BULK,
+    HELIX_PRIORITY_INTERACTIVE,
+    HELIX_PRIORITY_LIVE,
     _get_channel_info,
     _get_costs,
     _get_streamers_info,
     _get_streams_info,
     _subscribe_event,
     _unsubscribe_event,
+    helix_priority,
 )
 
+# concurrent stream info lookups are sent in one /streams request,
+# which accepts up to 100 ids
+STREAMS_BATCH_WINDOW = 0.005
+STREAMS_BATCH_SIZE = 100
+
+# max ids per /users and /streams request, /streams answers with
+# 20 streams by default, so page size is passed too
+HELIX_PAGE_SIZE = 100
+HELIX_PAGES_CONCURRENCY = 4
+
 
 async def _make_api_request(
-    api_function: Callable[..., Awaitable[Response]], *args, **kwargs
+    api_function: Callable[..., Awaitable[Response]],
+    *args,
+    priority: int = HELIX_PRIORITY_INTERACTIVE,
+    **kwargs,
 ) -> Response:
+    # expired token and rate limit are handled by client auth
+    priority_token = helix_priority.set(priority)
     try:
-        answer = await api_function(*args, **kwargs)
-        if answer.status_code == 401:
-            await _auth()
-            answer = await api_function(*args, **kwargs)
-        return answer
+        return await api_function(*args, **kwargs)
     except Exception:
         return Response(status_code=-1, content="{}")
+    finally:
+        helix_priority.reset(priority_token)
 
 
 async def get_streamer_info(streamer_login: str) -> dict[str, str]:
@@ -41,76 +59,132 @@ async def get_streamer_info(streamer_login: str) -> dict[str, str]:
     }
 
 
-async def get_streamers_names(streamers_ids: list[str]) -> dict[str, str]:
-    result = {}
-    slice_size = 100
-    while streamers_ids:
-        streamers_ids_slice = streamers_ids[:slice_size]
-        answer = await _make_api_request(
-            _get_streamers_info, {"id": streamers_ids_slice}
-        )
-
-        answer_json = answer.json()
-        if not answer_json.get("data"):
-            return {}
-        else:
-            result.update(
-                {
-                    streamer["id"]: streamer["display_name"]
-                    for streamer in answer_json["data"]
-                }
+async def _get_pages(
+    api_function: Callable[..., Awaitable[Response]],
+    ids_param: str,
+    ids: list[str],
+    params: dict[str, str] | None = None,
+) -> list[dict]:
+    # all pages are requested concurrently, failed or empty page
+    # doesn't drop the others
+    semaphore = asyncio.Semaphore(HELIX_PAGES_CONCURRENCY)
+
+    async def get_page(ids_slice: list[str]) -> list[dict]:
+        async with semaphore:
+            answer = await _make_api_request(
+                api_function,
+                {**(params or {}), ids_param: ids_slice},
+                priority=HELIX_PRIORITY_BULK,
             )
-        del streamers_ids[:slice_size]
-
-    return result
+        if answer.status_code != 200:
+            cfg.logger.error(f"Getting page error with code {answer.status_code}")
+            return []
+        return answer.json().get("data", [])
 
+    pages = await asyncio.gather(
+        *[
+            get_page(ids[index : index + HELIX_PAGE_SIZE])
+            for index in range(0, len(ids), HELIX_PAGE_SIZE)
+        ]
+    )
+    return [item for page in pages for item in page]
 
-async def get_stream_info(streamer_id: str) -> dict[str, str]:
-    answer = await _make_api_request(_get_streams_info, {"user_id": streamer_id})
-    if answer.status_code != 200:
-        cfg.logger.error(f"Getting streamer info error with code {answer.status_code}")
-        return {}
 
-    answer_json = answer.json()
-    if not answer_json.get("data"):
-        return {}
-    return {
-        "title": answer_json["data"][0]["title"],
-        "category": answer_json["data"][0]["game_name"],
-        "thumbnail_url": answer_json["data"][0]["thumbnail_url"],
-    }
+async def get_streamers_names(streamers_ids: list[str]) -> dict[str, str]:
+    streamers = await _get_pages(_get_streamers_info, "id", streamers_ids)
+    return {streamer["id"]: streamer["display_name"] for streamer in streamers}
+
+
+class StreamInfoBatcher:
+    def __init__(self) -> None:
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._timer: asyncio.Task | None = None
+
+    async def get(self, streamer_id: str) -> dict[str, str]:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(streamer_id, []).append(future)
+        if len(self._waiters) >= STREAMS_BATCH_SIZE:
+            self._send_batch()
+        elif self._timer == None:
+            self._timer = asyncio.create_task(self._send_later())
+        return await future
+
+    async def _send_later(self) -> None:
+        await asyncio.sleep(STREAMS_BATCH_WINDOW)
+        self._timer = None
+        if self._waiters:
+            self._send_batch()
+
+    def _send_batch(self) -> None:
+        batch, self._waiters = self._waiters, {}
+        create_background_task(self._send(batch))
+
+    async def _send(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        streams = {}
+        try:
+            answer = await _make_api_request(
+                _get_streams_info,
+                {"user_id": list(batch), "first": str(STREAMS_BATCH_SIZE)},
+                priority=HELIX_PRIORITY_LIVE,
+            )
+            if answer.status_code != 200:
+                cfg.logger.error(
+                    f"Getting streamer info error with code {answer.status_code}"
+                )
+            else:
+                streams = {
+                    stream["user_id"]: stream
+                    for stream in answer.json().get("data", [])
+                }
+        except Exception as exc:
+            cfg.logger.error(f"Getting streamer info error: {exc}")
+
+        # waiter could be cancelled while request was in flight
+        for streamer_id, futures in batch.items():
+            stream = streams.get(streamer_id)
+            for future in futures:
+                if future.done():
+                    continue
+                if stream == None:
+                    future.set_result({})
+                else:
+                    future.set_result(
+                        {
+                            "title": stream["title"],
+                            "category": stream["game_name"],
+                            "thumbnail_url": stream["thumbnail_url"],
+                        }
+                    )
+
+
+stream_info_batcher = StreamInfoBatcher()
 
 
-async def get_streams_info(streamers_ids: list[str]) -> dict[str, dict[str, str]]:
-    result = {}
-    slice_size = 50
-    while streamers_ids:
-        streamers_ids_slice = streamers_ids[:slice_size]
-        answer = await _make_api_request(
-            _get_streams_info, {"user_id": streamers_ids_slice}
-        )
+async def get_stream_info(streamer_id: str) -> dict[str, str]:
+    return await stream_info_batcher.get(streamer_id)
 
-        answer_json = answer.json()
-        if not answer_json.get("data"):
-            return {}
-        else:
-            result.update(
-                {
-                    stream["user_id"]: {
-                        "user_name": stream["user_name"],
-                        "title": stream["title"],
-                        "category": stream["game_name"],
-                    }
-                    for stream in answer_json["data"]
-                }
-            )
-        del streamers_ids[:slice_size]
 
-    return result
+async def get_streams_info(streamers_ids: list[str]) -> dict[str, dict[str, str]]:
+    streams = await _get_pages(
+        _get_streams_info,
+        "user_id",
+        streamers_ids,
+        {"first": str(HELIX_PAGE_SIZE)},
+    )
+    return {
+        stream["user_id"]: {
+            "user_name": stream["user_name"],
+            "title": stream["title"],
+            "category": stream["game_name"],
+        }
+        for stream in streams
+    }
 
 
 async def get_channel_info(streamer_id: str) -> dict[str, str]:
-    answer = await _make_api_request(_get_channel_info, streamer_id)
+    answer = await _make_api_request(
+        _get_channel_info, streamer_id, priority=HELIX_PRIORITY_LIVE
+    )
     if answer.status_code != 200:
         cfg.logger.error(f"Getting channel info error with code {answer.status_code}")
         return {}
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+from common.config import cfg
+
+THUMBNAIL_CACHE_SIZE = 64
+THUMBNAIL_CACHE_TTL = 60.0
+
+
+class ThumbnailFetcher:
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+        self._cache: OrderedDict[
+            tuple[str, int, int], tuple[float, bytes, datetime | None]
+        ] = OrderedDict()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client == None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client:
+            await self._client.aclose()
+
+    def _get_cached(
+        self, key: tuple[str, int, int], newer_than: datetime | None
+    ) -> bytes | None:
+        cached = self._cache.get(key)
+        if cached == None:
+            return None
+        cached_time, thumbnail, last_modified = cached
+        if time.monotonic() - cached_time > THUMBNAIL_CACHE_TTL:
+            del self._cache[key]
+            return None
+        if newer_than and last_modified and last_modified < newer_than:
+            return None
+        self._cache.move_to_end(key)
+        return thumbnail
+
+    def _set_cached(
+        self,
+        key: tuple[str, int, int],
+        thumbnail: bytes,
+        last_modified: datetime | None,
+    ) -> None:
+        self._cache[key] = (time.monotonic(), thumbnail, last_modified)
+        self._cache.move_to_end(key)
+        while len(self._cache) > THUMBNAIL_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def fetch(
+        self,
+        streamer_login: str,
+        thumbnail_url: str,
+        width: int,
+        height: int,
+        newer_than: datetime | None = None,
+    ) -> bytes | None:
+        # thumbnail older than newer_than is treated as missing
+        key = (streamer_login, width, height)
+        thumbnail = self._get_cached(key, newer_than)
+        if thumbnail != None:
+            return thumbnail
+
+        utc_now = datetime.now(tz=timezone.utc).strftime("%Y_%m_%d_%H_%M_%S_%f")
+        try:
+            # missing thumbnail is redirected to 404 preview, so no redirects
+            answer = await self._get_client().get(
+                thumbnail_url.format(width=str(width), height=str(height)),
+                params={"timestamp": utc_now},
+            )
+            if answer.status_code != 200:
+                raise Exception(f"Response: {answer.status_code}")
+        except Exception as e:
+            cfg.logger.warning(f"Getting thumbnail of {streamer_login} error: {e}")
+            return None
+
+        last_modified = None
+        with suppress(Exception):
+            last_modified = parsedate_to_datetime(answer.headers["last-modified"])
+
+        thumbnail = answer.content
+        self._set_cached(key, thumbnail, last_modified)
+        if newer_than and last_modified and last_modified < newer_than:
+            cfg.logger.info(f"Thumbnail of {streamer_login} is older than stream")
+            return None
+        return thumbnail
+
+
+thumbnails = ThumbnailFetcher()